@@ -1,14 +1,26 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from contextlib import asynccontextmanager  # ✅ ADDED: For lifespan management
 from dotenv import load_dotenv
 from starlette.middleware.sessions import SessionMiddleware
+import hmac
 import os
 import sys
 from pathlib import Path
 from routers import auth_router, user_router, admin_router
-from database.db import test_connection, close_connection  # ✅ ADDED: Import connection functions
+from database.db import client, test_connection, close_connection  # ✅ ADDED: Import connection functions
+from database.monitoring import start_slow_query_explainer, stop_slow_query_explainer
+from utils.metrics import PROMETHEUS_CONTENT_TYPE
+from utils.request_metrics import RequestMetricsMiddleware, render_metrics
+from utils.loop_monitor import start_loop_monitor, stop_loop_monitor
+from services.password_service import shutdown_password_pool
+from database.indexes import ensure_indexes
+from services.rollup_service import start_rollup_compactor, stop_rollup_compactor
+from services.txn_writer import txn_writer
+from services.recharge_service import start_catalog_poller, stop_catalog_poller
 
 # Load environment variables FIRST (before any imports that use them)
 env_file = Path(__file__).parent.parent / '.env'
@@ -26,6 +38,8 @@ load_dotenv(dotenv_path=env_file, override=False)  # Don't override existing sys
 # Load from .env file first, then check system env
 load_dotenv(dotenv_path=env_file, override=True)  # Force override system vars
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
+# Shared secret the Prometheus scraper sends as "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
 
 # Required Environment Variables
 REQUIRED_ENV_VARS = {
@@ -55,6 +69,9 @@ def validate_environment():
         elif var == "MONGODB_URL" and value == "mongodb://localhost:27017" and ENVIRONMENT == "production":
             weak_configs.append(f"⚠️ {var} using local database in production")
     
+    if ENVIRONMENT == "production" and not METRICS_TOKEN:
+        print("⚠️ METRICS_TOKEN not set: /metrics is disabled")
+
     if missing_vars:
         print("\n🚨 CRITICAL: Missing required environment variables:")
         for var in missing_vars:
@@ -87,12 +104,23 @@ async def lifespan(app: FastAPI):
     if not connection_success:
         print("❌ Failed to connect to MongoDB - shutting down")
         sys.exit(1)
+    await ensure_indexes()  # Idempotent, see database/indexes.py
+    start_rollup_compactor()
+    start_catalog_poller()
+    start_slow_query_explainer(client)
+    start_loop_monitor()
     print("✅ All systems ready!\n")
     
     yield
     
     # Shutdown
     print("\n🔌 Shutting down...")
+    await stop_rollup_compactor()
+    await stop_catalog_poller()
+    await stop_slow_query_explainer()
+    await stop_loop_monitor()
+    await txn_writer.close()  # Flush coalesced transaction inserts before the client closes
+    await shutdown_password_pool()
     await close_connection()
     print("👋 Goodbye!\n")
 
@@ -171,6 +199,35 @@ app.add_middleware(
     max_age=600
 )
 
+# Added last = outermost: times every request, CORS preflights included
+app.add_middleware(RequestMetricsMiddleware)
+
+# Prometheus scrape endpoint (per-route HTTP, Mongo pool and command, event-loop lag metrics).
+# Requires "Authorization: Bearer <METRICS_TOKEN>"; in prometheus.yml:
+#   scrape_configs:
+#     - job_name: khazana-khelo
+#       authorization:
+#         type: Bearer
+#         credentials_file: /etc/prometheus/metrics_token
+# Without METRICS_TOKEN the endpoint is open in development and disabled (404) in production.
+metrics_bearer = HTTPBearer(auto_error=False)
+
+def require_metrics_token(credentials: HTTPAuthorizationCredentials = Depends(metrics_bearer)):
+    if not METRICS_TOKEN:
+        if ENVIRONMENT == "production":
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+        return
+    if credentials is None or not hmac.compare_digest(credentials.credentials.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 # Protected routes
 PROTECTED_PATHS = [  # ✅ CHANGED: Renamed from protected_path to PROTECTED_PATHS (convention)
     '/api/v1/admin/update-upi_id',
@@ -180,6 +237,7 @@ PROTECTED_PATHS = [  # ✅ CHANGED: Renamed from protected_path to PROTECTED_PAT
     '/api/v1/admin/all_wallet_data',
     '/api/v1/admin/user/{user_id}/transactions',
     '/api/v1/admin/users_with_txn_summary',
+    '/api/v1/admin/export_transactions',
     '/api/v1/admin/todays_earnings',
     '/api/v1/admin/monthly_earnings',
     '/api/v1/admin/last_year_earnings',
@@ -187,7 +245,17 @@ PROTECTED_PATHS = [  # ✅ CHANGED: Renamed from protected_path to PROTECTED_PAT
     '/api/v1/admin/monthly_earnings_with_period',
     '/api/v1/admin/monthly_user_growth',
     '/api/v1/admin/monthly_combined_data',
-    '/api/v1/user/create_transaction'
+    '/api/v1/admin/dashboard',
+    '/api/v1/admin/user_cache_stats',
+    '/api/v1/admin/txn_writer_stats',
+    '/api/v1/admin/idempotency_cache_stats',
+    '/api/v1/admin/pack_catalog_stats',
+    '/api/v1/admin/analytics_cache_stats',
+    '/api/v1/admin/mongo_command_stats',
+    '/api/v1/admin/event_loop_stats',
+    '/api/v1/admin/password_pool_stats',
+    '/api/v1/user/create_transaction',
+    '/api/v1/user/create_transactions_bulk'
 ]
 
 # Custom OpenAPI
@@ -1,4 +1,6 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import Nearest, Primary, SecondaryPreferred
+from database.monitoring import command_monitor, pool_monitor
 import os
 import logging
 import certifi
@@ -15,6 +17,14 @@ db_url = os.getenv("MONGODB_URL")
 database_name = os.getenv("DATABASE", "khazana_khelo")
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 
+# Read-only admin analytics go to secondaries so their scans don't compete with
+# create_transaction writes on the primary. secondaryPreferred (and nearest) fall back to
+# the primary when no secondary qualifies, which is always the case on a standalone or
+# single-node deployment; ANALYTICS_READ_PREFERENCE=primary pins them there explicitly.
+ANALYTICS_READ_PREFERENCE = os.getenv("ANALYTICS_READ_PREFERENCE", "secondaryPreferred")
+# Secondaries lagging further behind are not selected; drivers require >= 90, -1 = no limit
+ANALYTICS_MAX_STALENESS_SECONDS = int(os.getenv("ANALYTICS_MAX_STALENESS_SECONDS", 90))
+
 # Validate critical environment variables
 if not db_url:
     logger.error("❌ MONGODB_URL environment variable not set")
@@ -24,6 +34,15 @@ if not database_name:
     logger.error("❌ DATABASE environment variable not set")
     raise ValueError("DATABASE environment variable is required")
 
+_ANALYTICS_READ_PREFERENCES = {"secondaryPreferred": SecondaryPreferred, "nearest": Nearest, "primary": Primary}
+if ANALYTICS_READ_PREFERENCE not in _ANALYTICS_READ_PREFERENCES:
+    logger.error(f"❌ Invalid ANALYTICS_READ_PREFERENCE: {ANALYTICS_READ_PREFERENCE}")
+    raise ValueError(f"ANALYTICS_READ_PREFERENCE must be one of {', '.join(_ANALYTICS_READ_PREFERENCES)}")
+
+if ANALYTICS_MAX_STALENESS_SECONDS != -1 and ANALYTICS_MAX_STALENESS_SECONDS < 90:
+    logger.error(f"❌ Invalid ANALYTICS_MAX_STALENESS_SECONDS: {ANALYTICS_MAX_STALENESS_SECONDS}")
+    raise ValueError("ANALYTICS_MAX_STALENESS_SECONDS must be -1 or at least 90")
+
 # MongoDB Client Configuration
 try:
     if "mongodb+srv://" in db_url:
@@ -37,6 +56,7 @@ try:
             "connectTimeoutMS": 10000,
             "socketTimeoutMS": 60000,
             "retryWrites": True,
+            "event_listeners": [command_monitor, pool_monitor],  # Latency histograms, slow-query log, pool waits
         }
         
         # 👉🏻 MAIN CHANGE: Different SSL for development vs production
@@ -62,7 +82,7 @@ try:
         
     else:
         # Local MongoDB
-        client = AsyncIOMotorClient(db_url)
+        client = AsyncIOMotorClient(db_url, event_listeners=[command_monitor, pool_monitor])
         db = client[database_name]
         logger.info("✅ Local MongoDB connected")
         
@@ -75,12 +95,34 @@ user_db = db.get_collection("users")
 user_transaction_db = db.get_collection("user_transactions")
 admin_db = db.get_collection("admin_db")
 recharge_pack_db = db.get_collection("recharge_packs")
+otp_db = db.get_collection("otp_codes")
+user_balance_db = db.get_collection("user_balances")
+daily_rollup_db = db.get_collection("daily_txn_rollups")
+
+# Same client and pool, different read preference: use these for read-only analytics only
+if ANALYTICS_READ_PREFERENCE == "primary":
+    analytics_read_preference = Primary()
+else:
+    analytics_read_preference = _ANALYTICS_READ_PREFERENCES[ANALYTICS_READ_PREFERENCE](
+        max_staleness=ANALYTICS_MAX_STALENESS_SECONDS
+    )
+analytics_db = db.with_options(read_preference=analytics_read_preference)
+analytics_user_db = analytics_db.get_collection("users")
+analytics_transaction_db = analytics_db.get_collection("user_transactions")
+analytics_rollup_db = analytics_db.get_collection("daily_txn_rollups")
 
 # 👉🏻 ADDED: Connection test
 async def test_connection():
     try:
         await client.admin.command("ping")
         logger.info("✅ MongoDB ping successful")
+        hello = await client.admin.command("hello")
+        if hello.get("setName") and ANALYTICS_READ_PREFERENCE != "primary":
+            logger.info(f"📊 Analytics reads: {ANALYTICS_READ_PREFERENCE} "
+                        f"(maxStalenessSeconds={ANALYTICS_MAX_STALENESS_SECONDS}) on replica set '{hello['setName']}', "
+                        f"{len(hello.get('hosts', [])) - 1} secondaries")
+        else:
+            logger.info("📊 Analytics reads: primary (not a replica set or pinned by ANALYTICS_READ_PREFERENCE)")
         return True
     except Exception as e:
         logger.error(f"❌ MongoDB ping failed: {str(e)}")
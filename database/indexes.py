@@ -0,0 +1,118 @@
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from database.db import db, logger
+
+# Declarative index registry: collection name -> IndexModels.
+# Applied idempotently at startup (app/main.py lifespan) and checked by scripts/ensure_indexes.py.
+# Every index has an explicit name so re-runs compare like with like.
+INDEXES = {
+    "users": [
+        # Mobile-only users have no email (and vice versa), so uniqueness only applies to real values
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True,
+                   partialFilterExpression={"email": {"$type": "string"}}),
+        IndexModel([("mobile_number", ASCENDING)], name="mobile_number_unique", unique=True,
+                   partialFilterExpression={"mobile_number": {"$type": "string"}}),
+        IndexModel([("created_at", ASCENDING)], name="created_at"),
+    ],
+    "user_transactions": [
+        IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING)], name="user_id_created_at"),
+        IndexModel([("created_at", ASCENDING), ("type", ASCENDING)], name="created_at_type"),
+        # Finance export order; resumable keyset on (created_at, _id) without a blocking sort
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_at_id"),
+        # Idempotency key for create_transaction retries; transactions without a reference_id are exempt
+        IndexModel([("user_id", ASCENDING), ("reference_id", ASCENDING)], name="user_id_reference_id_unique",
+                   unique=True, partialFilterExpression={"reference_id": {"$type": "string"}}),
+    ],
+    "recharge_packs": [
+        IndexModel([("pack_id", ASCENDING)], name="pack_id_unique", unique=True),
+    ],
+    "admin_db": [
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+    ],
+    "otp_codes": [
+        # Mongo's TTL monitor deletes expired OTPs (see utils/otp_store.MongoOTPStore). Keeps the
+        # default name MongoOTPStore used to create it under; a new name on the same keys fails
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_1", expireAfterSeconds=0),
+    ],
+}
+
+# Options that make two indexes on the same keys different indexes
+_COMPARED_OPTIONS = ("unique", "partialFilterExpression", "expireAfterSeconds", "sparse")
+
+
+def _key(spec: dict) -> tuple:
+    return tuple((field, direction) for field, direction in spec["key"].items())
+
+
+def _options(spec: dict) -> dict:
+    return {opt: spec[opt] for opt in _COMPARED_OPTIONS if opt in spec}
+
+
+async def ensure_collection_indexes(collection_name: str) -> list:
+    """Create the registered indexes of one collection; returns the index names.
+
+    One createIndexes per index: Mongo aborts every index of a command when one fails, so a
+    unique index blocked by duplicates would otherwise take the collection's plain indexes
+    down with it. Each failure is logged and the index left out of the returned names.
+    """
+    names = []
+    for model in INDEXES.get(collection_name, []):
+        try:
+            names += await db[collection_name].create_indexes([model])
+        except OperationFailure as e:
+            # e.g. duplicate emails blocking a unique index, or an existing index with other options
+            logger.error(f"❌ Index '{model.document['name']}' on '{collection_name}' failed: {e}")
+    return names
+
+
+def failed_indexes(collection_name: str, names: list) -> list:
+    """Registered indexes of a collection missing from what ensure_collection_indexes built"""
+    return [model.document["name"] for model in INDEXES.get(collection_name, []) if model.document["name"] not in names]
+
+
+async def ensure_indexes() -> dict:
+    """Apply the whole registry. Never raises, so a bad index cannot block startup."""
+    results = {}
+    for collection_name in INDEXES:
+        results[collection_name] = await ensure_collection_indexes(collection_name)
+    failed = sum(len(failed_indexes(name, names)) for name, names in results.items())
+    logger.info(f"✅ Indexes ensured on {len(results)} collections" + (f", {failed} failed" if failed else ""))
+    return results
+
+
+async def diff_indexes() -> dict:
+    """Compare the registry with the database.
+
+    Returns {collection: {"missing": [...], "mismatched": [...], "redundant": [...]}} where
+    - missing: registered but absent
+    - mismatched: same keys, different unique/partial/TTL options
+    - redundant: present but unregistered, or a non-unique prefix of another index
+    """
+    report = {}
+    for collection_name, models in INDEXES.items():
+        existing = [spec async for spec in db[collection_name].list_indexes()]
+        existing = [spec for spec in existing if spec["name"] != "_id_"]
+        existing_by_key = {_key(spec): spec for spec in existing}
+        wanted = [model.document for model in models]
+        wanted_keys = {_key(spec) for spec in wanted}
+
+        missing, mismatched, redundant = [], [], []
+        for spec in wanted:
+            current = existing_by_key.get(_key(spec))
+            if current is None:
+                missing.append(spec["name"])
+            elif _options(current) != _options(spec):
+                mismatched.append(f"{current['name']}: has {_options(current)}, want {_options(spec)}")
+
+        all_keys = [_key(spec) for spec in existing]
+        for spec in existing:
+            key = _key(spec)
+            if key not in wanted_keys:
+                redundant.append(f"{spec['name']} (not in registry)")
+            elif not spec.get("unique") and any(
+                other != key and other[:len(key)] == key for other in all_keys
+            ):
+                redundant.append(f"{spec['name']} (prefix of another index)")
+
+        report[collection_name] = {"missing": missing, "mismatched": mismatched, "redundant": redundant}
+    return report
@@ -0,0 +1,387 @@
+from collections import deque
+from pymongo import monitoring
+from typing import Dict, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from utils.metrics import Histogram
+
+# Command monitoring for every Motor call: a pymongo CommandListener (registered on the
+# client in database/db.py, next to PoolMonitor for connection checkout waits) records latency, collection and documents returned per
+# (command, collection). Commands slower than MONGO_SLOW_QUERY_MS are logged as one JSON
+# line with the filter/pipeline shape (values redacted) and, for reads, explained in the
+# background so COLLSCANs show up in production logs.
+#
+# pymongo calls listeners on Motor's executor threads: state below is guarded by _lock and
+# explains are handed to the event loop with call_soon_threadsafe.
+
+MONGO_SLOW_QUERY_MS = float(os.getenv("MONGO_SLOW_QUERY_MS", 100))
+MONGO_SLOW_QUERY_EXPLAIN = os.getenv("MONGO_SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+# The same shape is explained at most once per interval
+MONGO_SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = float(os.getenv("MONGO_SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", 600))
+
+LATENCY_MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+POOL_WAIT_SECONDS_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+RECENT_SLOW_QUERIES = 50
+EXPLAIN_QUEUE_SIZE = 100
+
+# Handshakes, heartbeats, auth and our own explains
+IGNORED_COMMANDS = {
+    "hello", "ismaster", "isMaster", "ping", "buildInfo", "buildinfo", "saslStart", "saslContinue",
+    "authenticate", "getnonce", "endSessions", "killCursors", "explain",
+}
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct"}
+# Parts of a command that describe the query; everything else (documents, session, cluster time) is dropped
+SHAPE_FIELDS = ("filter", "sort", "projection", "pipeline", "query", "key", "updates", "deletes", "update")
+# Session and routing fields the driver adds, never part of an explain
+_EXPLAIN_DROPPED = {"lsid", "txnNumber", "autocommit", "startTransaction", "apiVersion", "apiStrict", "apiDeprecationErrors"}
+
+slow_query_logger = logging.getLogger("slow_query")
+logger = logging.getLogger(__name__)
+
+
+def redact(value, expression: bool = False):
+    """Query shape: keys and operators kept, every literal value replaced by "?".
+
+    A "$name" string is a field path only inside an aggregation expression (expression=True,
+    or under $expr); in a filter or update document it is a user-supplied literal.
+    """
+    if isinstance(value, dict):
+        return {key: redact(item, expression or key == "$expr") for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if all(not isinstance(item, (dict, list, tuple)) and not (expression and _is_field_path(item)) for item in value):
+            return "?"  # A list of literals ($in values, array equality)
+        return [redact(item, expression) for item in value]
+    return value if expression and _is_field_path(value) else "?"
+
+
+def _is_field_path(value) -> bool:
+    return isinstance(value, str) and value.startswith("$")
+
+
+def redact_pipeline(stages):
+    """Stages are expressions, except $match (a filter) and the sub-pipelines they nest"""
+    if not isinstance(stages, (list, tuple)):
+        return redact(stages)
+    return [_redact_stage(stage) for stage in stages]
+
+
+def _redact_stage(stage):
+    if not isinstance(stage, dict):
+        return redact(stage)
+    redacted = {}
+    for name, body in stage.items():
+        if name == "$match":
+            redacted[name] = redact(body)
+        elif name == "$facet" and isinstance(body, dict):
+            redacted[name] = {key: redact_pipeline(sub) for key, sub in body.items()}
+        elif name in ("$lookup", "$unionWith") and isinstance(body, dict):
+            redacted[name] = {key: redact_pipeline(sub) if key == "pipeline" else redact(sub, expression=True)
+                              for key, sub in body.items()}
+        else:
+            redacted[name] = redact(body, expression=True)
+    return redacted
+
+
+def _redact_update(update):
+    # A list is an update pipeline (expressions); a document's $set values are literals
+    return redact_pipeline(update) if isinstance(update, (list, tuple)) else redact(update)
+
+
+def command_shape(command: dict) -> dict:
+    """SHAPE_FIELDS of a command, redacted according to where each one takes expressions"""
+    shape = {}
+    for field in SHAPE_FIELDS:
+        if field not in command:
+            continue
+        value = command[field]
+        if field == "pipeline":
+            shape[field] = redact_pipeline(value)
+        elif field == "update":
+            shape[field] = _redact_update(value)
+        elif field == "updates" and isinstance(value, (list, tuple)):
+            shape[field] = [
+                {key: _redact_update(item) if key == "u" else redact(item) for key, item in statement.items()}
+                if isinstance(statement, dict) else redact(statement)
+                for statement in value
+            ]
+        else:
+            shape[field] = redact(value)
+    return shape
+
+
+def plan_stages(explain: dict) -> set:
+    """All stage names in the winning plan(s), ignoring rejected alternatives"""
+    stages = set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "rejectedPlans":
+                    continue
+                if key == "stage" and isinstance(value, str):
+                    stages.add(value)
+                walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(explain)
+    return stages
+
+
+def _collection(command_name: str, command: dict) -> Optional[str]:
+    if command_name == "getMore":
+        return command.get("collection")
+    target = command.get(command_name)
+    return target if isinstance(target, str) else None
+
+
+def _docs_returned(reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if "values" in reply:  # distinct
+        return len(reply["values"])
+    if "value" in reply:  # findAndModify
+        return 1 if reply["value"] else 0
+    n = reply.get("n", 0)  # count, insert, update, delete
+    return n if isinstance(n, int) else 0
+
+
+class CommandMonitor(monitoring.CommandListener):
+    def __init__(self, slow_ms: float = MONGO_SLOW_QUERY_MS):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._started: Dict[Tuple[int, int], Tuple[str, Optional[str], dict]] = {}
+        self._latency: Dict[Tuple[str, Optional[str]], Histogram] = {}
+        self._docs: Dict[Tuple[str, Optional[str]], int] = {}
+        self._errors: Dict[Tuple[str, Optional[str]], int] = {}
+        self._explained: Dict[str, float] = {}
+        self.slow_queries = deque(maxlen=RECENT_SLOW_QUERIES)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._explain_queue: Optional[asyncio.Queue] = None
+
+    # ---------------- Listener callbacks (driver threads) ---------------- #
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        with self._lock:
+            # The command document is only available here; keep it until the reply arrives
+            self._started[(event.request_id, event.connection_id)] = (
+                event.database_name, _collection(event.command_name, event.command), event.command
+            )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finished(event, docs=_docs_returned(event.reply))
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finished(event, failure=event.failure)
+
+    def _finished(self, event, docs: int = 0, failure: Optional[dict] = None) -> None:
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        duration_ms = event.duration_micros / 1000
+        with self._lock:
+            database, collection, command = self._started.pop(
+                (event.request_id, event.connection_id), (event.database_name, None, {})
+            )
+            key = (event.command_name, collection)
+            if key not in self._latency:
+                self._latency[key] = Histogram(LATENCY_MS_BUCKETS)
+            self._latency[key].observe(duration_ms)
+            self._docs[key] = self._docs.get(key, 0) + docs
+            if failure is not None:
+                self._errors[key] = self._errors.get(key, 0) + 1
+        if duration_ms >= self.slow_ms:
+            self._slow(event.command_name, database, collection, command, duration_ms, docs, failure)
+
+    def _slow(self, command_name: str, database: str, collection: Optional[str], command: dict,
+              duration_ms: float, docs: int, failure: Optional[dict]) -> None:
+        shape = command_shape(command)
+        entry = {
+            "at": time.time(),
+            "command": command_name,
+            "database": database,
+            "collection": collection,
+            "duration_ms": round(duration_ms, 3),
+            "docs_returned": docs,
+            "shape": shape,
+        }
+        if failure is not None:
+            entry["error"] = failure.get("errmsg", str(failure))
+        with self._lock:
+            self.slow_queries.append(entry)
+        slow_query_logger.warning(json.dumps({"event": "slow_query", **entry}, default=str))
+        if MONGO_SLOW_QUERY_EXPLAIN and command_name in EXPLAINABLE_COMMANDS and failure is None:
+            self._queue_explain(entry, command)
+
+    def _queue_explain(self, entry: dict, command: dict) -> None:
+        signature = json.dumps([entry["database"], entry["collection"], entry["command"], entry["shape"]],
+                               sort_keys=True, default=str)
+        now = time.monotonic()
+        with self._lock:
+            if self._loop is None or now - self._explained.get(signature, -float("inf")) < MONGO_SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS:
+                return
+            self._explained[signature] = now
+            loop = self._loop
+        body = {key: value for key, value in command.items() if not key.startswith("$") and key not in _EXPLAIN_DROPPED}
+        try:
+            loop.call_soon_threadsafe(self._enqueue, entry, body)
+        except RuntimeError:
+            pass  # Loop already closed (shutdown)
+
+    def _enqueue(self, entry: dict, body: dict) -> None:
+        if self._explain_queue is not None and not self._explain_queue.full():
+            self._explain_queue.put_nowait((entry, body))
+
+    # ---------------- Explainer (event loop) ---------------- #
+    async def _explain_loop(self, client) -> None:
+        while True:
+            entry, body = await self._explain_queue.get()
+            try:
+                explain = await client[entry["database"]].command("explain", body, verbosity="queryPlanner")
+                stages = sorted(plan_stages(explain))
+                entry["plan"] = stages
+                entry["collscan"] = "COLLSCAN" in stages
+                slow_query_logger.warning(json.dumps({
+                    "event": "slow_query_plan",
+                    "command": entry["command"],
+                    "collection": entry["collection"],
+                    "shape": entry["shape"],
+                    "stages": stages,
+                    "collscan": entry["collscan"],
+                }, default=str))
+            except Exception as e:
+                logger.error(f"❌ Explain of slow {entry['command']} on {entry['collection']} failed: {str(e)}")
+
+    def start_explainer(self, client) -> Optional[asyncio.Task]:
+        if not MONGO_SLOW_QUERY_EXPLAIN:
+            return None
+        self._explain_queue = asyncio.Queue(maxsize=EXPLAIN_QUEUE_SIZE)
+        self._loop = asyncio.get_running_loop()
+        return asyncio.create_task(self._explain_loop(client))
+
+    def stop_explainer(self) -> None:
+        with self._lock:
+            self._loop = None
+        self._explain_queue = None
+
+    # ---------------- Stats ---------------- #
+    def latency_series(self) -> list:
+        """[((command, collection), Histogram, errors)] for the /metrics exporter"""
+        with self._lock:
+            return [(key, histogram.copy(), self._errors.get(key, 0)) for key, histogram in self._latency.items()]
+
+    def stats(self) -> dict:
+        with self._lock:
+            commands = [
+                {
+                    "command": command,
+                    "collection": collection,
+                    "errors": self._errors.get((command, collection), 0),
+                    "docs_returned": self._docs.get((command, collection), 0),
+                    "latency_ms": histogram.snapshot(),
+                }
+                for (command, collection), histogram in sorted(self._latency.items(), key=lambda item: (item[0][0], item[0][1] or ""))
+            ]
+            slow = list(self.slow_queries)
+        return {
+            "slow_query_ms": self.slow_ms,
+            "explain": MONGO_SLOW_QUERY_EXPLAIN,
+            "commands": commands,
+            "slow_queries": slow,
+        }
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection-pool checkout wait: how long a Motor call queued for a free connection.
+
+    Called concurrently on driver threads; every update and snapshot() hold _lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkout_wait = Histogram(POOL_WAIT_SECONDS_BUCKETS)
+        self.checkout_failures: Dict[str, int] = {}
+        self.checked_out = 0
+        self.open_connections = 0
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        with self._lock:
+            self.checked_out += 1
+            if event.duration is not None:
+                self.checkout_wait.observe(event.duration)
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        with self._lock:
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+            if event.duration is not None:
+                self.checkout_wait.observe(event.duration)
+
+    def connection_checked_in(self, event) -> None:
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event) -> None:
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event) -> None:
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def snapshot(self) -> dict:
+        """Consistent copy of every pool metric for the /metrics exporter"""
+        with self._lock:
+            return {
+                "checkout_wait": self.checkout_wait.copy(),
+                "checkout_failures": dict(self.checkout_failures),
+                "checked_out": self.checked_out,
+                "open_connections": self.open_connections,
+            }
+
+
+command_monitor = CommandMonitor()
+pool_monitor = PoolMonitor()
+
+_explainer_task: Optional[asyncio.Task] = None
+
+
+def start_slow_query_explainer(client) -> None:
+    global _explainer_task
+    if _explainer_task is None:
+        _explainer_task = command_monitor.start_explainer(client)
+
+
+async def stop_slow_query_explainer() -> None:
+    global _explainer_task
+    command_monitor.stop_explainer()
+    if _explainer_task is not None:
+        _explainer_task.cancel()
+        try:
+            await _explainer_task
+        except asyncio.CancelledError:
+            pass
+        _explainer_task = None
@@ -1,12 +1,33 @@
 
-from fastapi import APIRouter, Body, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from bson import ObjectId
 from typing import Optional
+from datetime import datetime
+import json
 from utils.auth_util import  get_current_user
-from database.db import admin_db, user_db, user_transaction_db
+from utils.user_cache import invalidate_user, user_cache_stats
+from services.txn_writer import txn_writer
+from utils.idempotency_cache import idempotency_cache_stats
+from services.password_service import hash_password_async, password_pool_stats
+from utils.query_builder import created_at_range, date_part, day_bounds, ist_now, last_month, month_bounds, period_bounds, to_utc_naive, year_bounds, year_match
+from services.ledger_service import filtered_summary, ledger_summary
+from services.dashboard_service import dashboard
+from services.export_service import EXPORT_MEDIA_TYPES, resume_filter, stream_transactions
+from utils.fanout import Query as FanoutQuery, fanout, max_time_ms
+from utils.single_flight import single_flight, single_flight_stats
+from utils.hll import HLL_STANDARD_ERROR
+from services.rollup_service import add_totals, distinct_users, earnings_record, empty_totals, monthly_totals, range_totals
+from utils.pagination import ID_TYPES, after_created_at_desc, after_id, decode_cursor, encode_cursor, page_size, projection_from_fields
+from database.monitoring import command_monitor
+from utils.loop_monitor import loop_monitor
+from database.db import admin_db, analytics_transaction_db, analytics_user_db, user_db, user_transaction_db
 from schemas.recharge_schema import  RechargePackCreate, RechargePackUpdate
 from schemas.auth_schema import UpdateProfileRequest
-from services.recharge_service import create_pack, get_all_packs,get_pack_by_id,update_pack,delete_pack,hard_delete_pack
+from schemas.user_transaction_schema import TransactionType
+from services.recharge_service import create_pack,get_pack_by_id,update_pack,delete_pack,hard_delete_pack
+from services.recharge_service import cached_catalog_etag, catalog_stats, get_catalog, record_not_modified
 from fastapi import Query
 
 router = APIRouter(prefix='/api/v1/admin', tags=['Admin'])
@@ -65,8 +86,7 @@ async def update_profile(data: UpdateProfileRequest, current_user: dict = Depend
     updated_field = {}
     
     if data.password:
-        from utils.auth_util import hash_password
-        hashed_password = hash_password(data.password)
+        hashed_password = await hash_password_async(data.password)
         updated_field['password'] = hashed_password
         
     if data.email:
@@ -83,6 +103,7 @@ async def update_profile(data: UpdateProfileRequest, current_user: dict = Depend
         {"_id": user_id},
         {"$set": updated_field}
     )
+    invalidate_user(user_id)  # Cached copy still has the old email/password
     
     if result.modified_count == 0:
         raise HTTPException(
@@ -100,6 +121,41 @@ async def update_profile(data: UpdateProfileRequest, current_user: dict = Depend
         "updated_fields": list(updated_field.keys())
     }
 
+@router.get('/user_cache_stats')
+async def get_user_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Hit/miss counters of the authenticated-user cache"""
+    return user_cache_stats()
+
+@router.get('/txn_writer_stats')
+async def get_txn_writer_stats(current_user: dict = Depends(get_current_user)):
+    """Batch-size and linger histograms of the transaction write-coalescer"""
+    return txn_writer.stats()
+
+@router.get('/analytics_cache_stats')
+async def get_analytics_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Single-flight counters of the analytics endpoints; dedup_ratio = share of requests that ran no query"""
+    return single_flight_stats()
+
+@router.get('/mongo_command_stats')
+async def get_mongo_command_stats(current_user: dict = Depends(get_current_user)):
+    """Per-(command, collection) latency histograms and the most recent slow queries with their plans"""
+    return command_monitor.stats()
+
+@router.get('/event_loop_stats')
+async def get_event_loop_stats(current_user: dict = Depends(get_current_user)):
+    """Event-loop lag histogram and the latest blocking-call reports (stack and task of each stall)"""
+    return loop_monitor.stats()
+
+@router.get('/password_pool_stats')
+async def get_password_pool_stats(current_user: dict = Depends(get_current_user)):
+    """Size and current load of the bcrypt worker pool (admission sheds with 503 past workers + max_queue)"""
+    return password_pool_stats()
+
+@router.get('/idempotency_cache_stats')
+async def get_idempotency_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Retries answered from the recent-key cache vs caught by the unique index"""
+    return idempotency_cache_stats()
+
 @router.get('/profile/{admin_id}')
 async def getProfile(admin_id: str, current_user: dict = Depends(get_current_user)):
     admin = await user_db.find_one({"_id": admin_id})
@@ -108,20 +164,47 @@ async def getProfile(admin_id: str, current_user: dict = Depends(get_current_use
     return {"email": admin.get("email")}
     
         
+async def _stream_users_ndjson(query: dict, projection: dict, limit: Optional[int]):
+    """One JSON user per line, read through a batched cursor so memory stays flat"""
+    users_cursor = user_db.find(query, projection).sort("_id", 1).batch_size(500)
+    if limit:
+        users_cursor = users_cursor.limit(limit)
+    async for user in users_cursor:
+        yield json.dumps(jsonable_encoder(user, custom_encoder={ObjectId: str})) + "\n"
+
 @router.get('/get_all_users')
-async def get_all_users(current_user: dict = Depends(get_current_user)):
+async def get_all_users(
+    limit: Optional[int] = None,  # Page size (json), or max rows (ndjson, default: all)
+    cursor: Optional[str] = None,  # next_cursor from the previous page
+    fields: Optional[str] = None,  # e.g. "name,mobile_number,created_at"
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    current_user: dict = Depends(get_current_user)
+):
     try:
         # users_cursor = user_db.find({"role": {"$ne": "admin"}}, {"password": 0})
-        users_cursor = user_db.find({}, {"password": 0})
-        users = []
-        async for user in users_cursor:
+        projection = projection_from_fields(fields)
+        query = after_id(decode_cursor(cursor, id=ID_TYPES)["id"]) if cursor else {}
+        
+        if format == "ndjson":
+            return StreamingResponse(
+                _stream_users_ndjson(query, projection, limit),
+                media_type="application/x-ndjson"
+            )
+        
+        # Keyset pagination on _id
+        size = page_size(limit)
+        users = await user_db.find(query, projection).sort("_id", 1).limit(size).to_list(length=size)
+        next_cursor = encode_cursor(id=users[-1]["_id"]) if len(users) == size else None
+        for user in users:
             user["_id"] = str(user["_id"])
-            users.append(user)
-        return {"users": users}
+        return {"users": users, "count": len(users), "next_cursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching users: {str(e)}")
 
 @router.get('/all_wallet_data')
+@single_flight('all_wallet_data')
 async def get_all_wallet_data(current_user: dict = Depends(get_current_user)):
     try:
         pipeline = [
@@ -133,7 +216,7 @@ async def get_all_wallet_data(current_user: dict = Depends(get_current_user)):
             }
         }
         ]
-        result = await user_transaction_db.aggregate(pipeline).to_list(length=None)
+        result = await analytics_transaction_db.aggregate(pipeline).to_list(length=None)
     
         totals = {"wallet_topup": 0, "game_fee": 0, "winning": 0, "withdrawal": 0}
         for record in result:
@@ -153,172 +236,110 @@ async def get_all_wallet_data(current_user: dict = Depends(get_current_user)):
 
 
 @router.get('/user/{user_id}/transactions')
-async def get_user_transactions(user_id: str, current_user: dict = Depends(get_current_user)):
+async def get_user_transactions(
+    user_id: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,  # next_cursor from the previous page
+    type: Optional[TransactionType] = None,
+    start_date: Optional[datetime] = None,  # created_at >= start_date
+    end_date: Optional[datetime] = None,  # created_at < end_date
+    current_user: dict = Depends(get_current_user)
+):
     try:
         if not ObjectId.is_valid(user_id):
             raise HTTPException(status_code=400, detail='Invalid User Id format')
         
-        txn_data = user_transaction_db.find({"user_id": ObjectId(user_id)})
-        transactions = []
-        
-        total_wallet_topup = 0
-        total_game_fee = 0
-        total_winning = 0
-        total_withdrawal = 0
-
-        async for txn in txn_data:
+        # Filters, served by the (user_id, created_at) index
+        match = {"user_id": ObjectId(user_id)}
+        if type:
+            match["type"] = type.value
+        if start_date or end_date:
+            match["created_at"] = {}
+            if start_date:
+                match["created_at"]["$gte"] = start_date
+            if end_date:
+                match["created_at"]["$lt"] = end_date
+        
+        # Summary over everything matching: stored ledger when unfiltered, one $group otherwise
+        if type or start_date or end_date:
+            summary = await filtered_summary(match)
+        else:
+            summary = await ledger_summary(user_id)
+        total_transactions = summary.pop("transaction_count")
+        
+        # Keyset page, newest first on (created_at, _id)
+        size = page_size(limit)
+        query = match
+        if cursor:
+            last = decode_cursor(cursor, created_at=(datetime,), id=ID_TYPES)
+            query = {**match, **after_created_at_desc(last["created_at"], last["id"])}
+        transactions = await user_transaction_db.find(query).sort(
+            [("created_at", -1), ("_id", -1)]
+        ).limit(size).to_list(length=size)
+        
+        next_cursor = None
+        if len(transactions) == size:
+            next_cursor = encode_cursor(created_at=transactions[-1]["created_at"], id=transactions[-1]["_id"])
+        
+        for txn in transactions:
             txn['_id'] = str(txn['_id'])
             txn["user_id"] = str(txn["user_id"])
-            transactions.append(txn)
-            
-            if txn['type'] == 'wallet_topup':
-                total_wallet_topup += txn['amount']
-            elif txn['type'] == 'game_fee':
-                total_game_fee += txn['amount']
-            elif txn['type'] == 'winning':
-                total_winning += txn['amount']
-            else:
-                total_withdrawal += txn['amount']
-        
-        summary = {
-            "total_wallet_topup": total_wallet_topup,
-            "total_game_fee": total_game_fee,
-            "total_winning": total_winning,
-            "total_withdrawal": total_withdrawal,
-            "net_balance": (total_wallet_topup + total_winning) - (total_withdrawal + total_game_fee)
-        }
 
-        if not transactions:
+        if not transactions and not cursor:
             return {"message": "No transactions found for this user", "transactions": []}
         
         return {
             "user_id": user_id,
-            "total_transactions": len(transactions),
+            "total_transactions": total_transactions,
             "summary": summary,
-            "transactions": transactions
+            "transactions": transactions,
+            "count": len(transactions),
+            "next_cursor": next_cursor
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching transactions: {str(e)}")
 
 
 @router.get("/users_with_txn_summary")
+@single_flight('users_with_txn_summary')
 async def get_users_with_txn_summary(current_user: dict = Depends(get_current_user)):
     try:
         pipeline = [
             # 1️⃣ Only non-admin users
             {"$match": {"role": {"$ne": "admin"}}},
+            {"$project": {"name": 1, "mobile_number": 1, "created_at": 1}},
 
-            # 2️⃣ Lookup transactions: convert users._id to string to match user_transactions.user_id
+            # 2️⃣ Join the materialized ledger on its _id index (keyed by the user id as string)
+            {"$addFields": {"balance_key": {"$toString": "$_id"}}},
             {
                 "$lookup": {
-                    "from": "user_transactions",
-                    "let": {"userId": "$_id"},  # pass ObjectId directly
-                    "pipeline": [
-                        {
-                            "$match": {
-                                "$expr": {
-                                    "$or": [
-                                        {"$eq": ["$user_id", "$$userId"]},
-                                        {"$eq": [{"$toString": "$user_id"}, {"$toString": "$$userId"}]}
-                                    ]
-                                }
-                            }
-                        }
-                    ],
-                    "as": "transactions"
+                    "from": "user_balances",
+                    "localField": "balance_key",
+                    "foreignField": "_id",
+                    "as": "balance"
                 }
             },
+            {"$addFields": {"balance": {"$arrayElemAt": ["$balance", 0]}}},
 
-            # 3️⃣ Calculate totals
-            {
-                "$addFields": {
-                    "total_credit": {
-                        "$sum": {
-                            "$map": {
-                                "input": {
-                                    "$filter": {
-                                        "input": "$transactions",
-                                        "as": "txn",
-                                        "cond": {"$eq": [{"$toString": "$$txn.type"}, "wallet_topup"]}
-                                    }
-                                },
-                                "as": "t",
-                                "in": "$$t.amount"
-                            }
-                        }
-                    },
-                    "total_game_fee": {
-                        "$sum": {
-                            "$map": {
-                                "input": {
-                                    "$filter": {
-                                        "input": "$transactions",
-                                        "as": "txn",
-                                        "cond": {"$eq": [{"$toString": "$$txn.type"}, "game_fee"]}
-                                    }
-                                },
-                                "as": "t",
-                                "in": "$$t.amount"
-                            }
-                        }
-                    },
-                    "total_winning": {
-                        "$sum": {
-                            "$map": {
-                                "input": {
-                                    "$filter": {
-                                        "input": "$transactions",
-                                        "as": "txn",
-                                        "cond": {"$eq": [{"$toString": "$$txn.type"}, "winning"]}
-                                    }
-                                },
-                                "as": "t",
-                                "in": "$$t.amount"
-                            }
-                        }
-                    },
-                    "total_withdrawal": {
-                        "$sum": {
-                            "$map": {
-                                "input": {
-                                    "$filter": {
-                                        "input": "$transactions",
-                                        "as": "txn",
-                                        "cond": {"$eq": [{"$toString": "$$txn.type"}, "withdrawal"]}
-                                    }
-                                },
-                                "as": "t",
-                                "in": "$$t.amount"
-                            }
-                        }
-                    },
-                    # Optional: net balance
-                    "net_balance": {
-                        "$subtract": [
-                            {"$add": ["$total_credit", "$total_winning"]},
-                            {"$add": ["$total_withdrawal", "$total_game_fee"]}
-                        ]
-                    }
-                }
-            },
-
-            # 4️⃣ Project only required fields
+            # 3️⃣ Project only required fields, users without transactions get zeros
             {
                 "$project": {
                     "name": 1,
                     # "email": 1,
                     "mobile_number":1,
                     "created_at": 1,
-                    "total_credit": 1,
-                    "total_game_fee": 1,
-                    "total_winning": 1,
-                    "total_withdrawal": 1,
-                    "net_balance": 1
+                    "total_credit": {"$ifNull": ["$balance.total_credit", 0]},
+                    "total_game_fee": {"$ifNull": ["$balance.total_game_fee", 0]},
+                    "total_winning": {"$ifNull": ["$balance.total_winning", 0]},
+                    "total_withdrawal": {"$ifNull": ["$balance.total_withdrawal", 0]},
+                    "net_balance": {"$ifNull": ["$balance.net_balance", 0]}
                 }
             }
         ]
 
-        users = await user_db.aggregate(pipeline).to_list(length=None)
+        users = await analytics_user_db.aggregate(pipeline).to_list(length=None)
 
         # Add serial numbers and convert _id to string
         for idx, user in enumerate(users, start=1):
@@ -331,25 +352,53 @@ async def get_users_with_txn_summary(current_user: dict = Depends(get_current_us
         raise HTTPException(status_code=500, detail=f"Error fetching user summaries: {str(e)}")
 
 
+@router.get('/export_transactions')
+async def export_transactions(
+    start_date: datetime,  # created_at >= start_date
+    end_date: datetime,  # created_at < end_date
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    type: Optional[TransactionType] = None,
+    resume_after: Optional[str] = None,  # _id of the last complete row of an interrupted export
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream every transaction in [start_date, end_date) in (created_at, _id) order, in constant memory"""
+    try:
+        # Naive inputs are UTC; an offset ("...+05:30") is honoured. Comparing an aware with
+        # a naive datetime would raise, so both go to naive UTC like the stored created_at
+        start_date, end_date = to_utc_naive(start_date), to_utc_naive(end_date)
+        if start_date >= end_date:
+            raise HTTPException(status_code=400, detail="start_date must be before end_date")
+        match = created_at_range(start_date, end_date)
+        if type:
+            match["type"] = type.value
+        if resume_after:
+            match.update(await resume_filter(resume_after))
+
+        filename = f"transactions_{start_date:%Y%m%d}_{end_date:%Y%m%d}.{format}" + (".gz" if gzip else "")
+        return StreamingResponse(
+            # A resumed CSV gets no second header, so the parts concatenate
+            stream_transactions(match, format, gzip, header=not resume_after),
+            media_type="application/gzip" if gzip else EXPORT_MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting transactions: {str(e)}")
+
+
 @router.get('/todays_earnings')
+@single_flight('todays_earnings')
 async def get_todays_earnings(current_user: dict = Depends(get_current_user)):
     try:
-        from datetime import datetime, timedelta
+        from datetime import datetime
 
-        # Calculate start and end of today in UTC
-        now = datetime.utcnow()
-        start_of_today = datetime(now.year, now.month, now.day)
-        start_of_tomorrow = start_of_today + timedelta(days=1)
+        # Start and end of today in IST
+        start_of_today, start_of_tomorrow = day_bounds(ist_now())
 
         pipeline = [
-            {
-                "$match": {
-                    "created_at": {
-                        "$gte": start_of_today,
-                        "$lt": start_of_tomorrow
-                    }
-                }
-            },
+            {"$match": created_at_range(start_of_today, start_of_tomorrow)},
             {
                 "$group": {
                     "_id": {"$toString": "$type"},
@@ -358,18 +407,17 @@ async def get_todays_earnings(current_user: dict = Depends(get_current_user)):
                 }
             }
         ]
-        result = await user_transaction_db.aggregate(pipeline).to_list(length=None)
+        # Today's totals and today's signups are independent, run them side by side
+        result, users_added_today = await fanout(
+            FanoutQuery(analytics_transaction_db.aggregate(pipeline, maxTimeMS=max_time_ms()).to_list(length=None), name="transactions"),
+            FanoutQuery(analytics_user_db.count_documents(
+                created_at_range(start_of_today, start_of_tomorrow), maxTimeMS=max_time_ms()
+            ), name="users_added_today"),
+        )
         totals = {"wallet_topup": 0, "game_fee": 0, "winning": 0, "withdrawal": 0}
         for record in result:
             totals[record["_id"]] = record["total_amount"]
         total_transactions = sum(r["count"] for r in result)
-        # Count users added today
-        users_added_today = await user_db.count_documents({
-            "created_at": {
-                "$gte": start_of_today,
-                "$lt": start_of_tomorrow
-            }
-        })
         return {
             "total_wallet_topup": totals["wallet_topup"],
             "total_game_fee": totals["game_fee"],
@@ -378,10 +426,13 @@ async def get_todays_earnings(current_user: dict = Depends(get_current_user)):
             "total_transactions": total_transactions,
             "users_added_today":users_added_today
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching today's earnings: {str(e)}")  
 
 @router.get('/monthly_earnings')
+@single_flight('monthly_earnings')
 async def get_monthly_earnings(
     year: Optional[int] = None,  # If None, use current year
     month: Optional[int] = None,  # If None, return all months
@@ -392,98 +443,22 @@ async def get_monthly_earnings(
         
         # If year not provided, use current year
         if year is None or year == 0:
-            year = datetime.utcnow().year
+            year = ist_now().year
         
         # Validate parameters
         if month is not None and (month < 1 or month > 12):
             raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
         
-        # Build match condition
-        match_condition = {
-            "$expr": {
-                "$eq": [{"$year": "$created_at"}, year]
-            }
-        }
-        
-        # If specific month requested
-        if month:
-            match_condition["$expr"] = {
-                "$and": [
-                    {"$eq": [{"$year": "$created_at"}, year]},
-                    {"$eq": [{"$month": "$created_at"}, month]}
-                ]
-            }
+        # Whole year, or one month of it: closed days from daily_txn_rollups + today's live tail
+        start, end = month_bounds(year, month) if month else year_bounds(year)
+        months = await monthly_totals(start, end)
         
-        pipeline = [
-            {"$match": match_condition},
-            {
-                "$group": {
-                    "_id": {
-                        "year": {"$year": "$created_at"},
-                        "month": {"$month": "$created_at"}
-                    },
-                    "wallet_topup": {
-                        "$sum": {
-                            "$cond": [
-                                {"$eq": [{"$toString": "$type"}, "wallet_topup"]},
-                                "$amount",
-                                0
-                            ]
-                        }
-                    },
-                    "game_fee": {
-                        "$sum": {
-                            "$cond": [
-                                {"$eq": [{"$toString": "$type"}, "game_fee"]},
-                                "$amount",
-                                0
-                            ]
-                        }
-                    },
-                    "winning": {
-                        "$sum": {
-                            "$cond": [
-                                {"$eq": [{"$toString": "$type"}, "winning"]},
-                                "$amount",
-                                0
-                            ]
-                        }
-                    },
-                    "withdrawal": {
-                        "$sum": {
-                            "$cond": [
-                                {"$eq": [{"$toString": "$type"}, "withdrawal"]},
-                                "$amount",
-                                0
-                            ]
-                        }
-                    },
-                    "transaction_count": {"$sum": 1}
-                }
-            },
-            {
-                "$project": {
-                    "_id": 0,
-                    "year": "$_id.year",
-                    "month": "$_id.month",
-                    "wallet_topup": 1,
-                    "game_fee": 1,
-                    "winning": 1,
-                    "withdrawal": 1,
-                    "net_earnings": {
-                        "$subtract": [
-                            {"$add": ["$wallet_topup", "$game_fee"]},
-                            {"$add": ["$winning", "$withdrawal"]}
-                        ]
-                    },
-                    "transaction_count": 1
-                }
-            },
-            {"$sort": {"year": 1, "month": 1}}
+        result = [
+            {"year": y, "month": m, **earnings_record(totals)}
+            for (y, m), totals in sorted(months.items())
+            if totals["transaction_count"] > 0
         ]
         
-        result = await user_transaction_db.aggregate(pipeline).to_list(length=None)
-        
         # Add month names
         month_names = [
             "January", "February", "March", "April", "May", "June",
@@ -500,133 +475,61 @@ async def get_monthly_earnings(
             "total_records": len(result)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
 
 @router.get('/last_year_earnings')
+@single_flight('last_year_earnings')
 async def get_last_year_earnings(current_user: dict = Depends(get_current_user)):
     try:
         from datetime import datetime
         
         # Get last year (2024 if current year is 2025)
-        current_year = datetime.utcnow().year
+        current_year = ist_now().year
         last_year = current_year - 1
         
-        # Build match condition for last year
-        match_condition = {
-            "$expr": {
-                "$eq": [{"$year": "$created_at"}, last_year]
-            }
-        }
-        
-        pipeline = [
-            {"$match": match_condition},
-            {
-                "$group": {
-                    "_id": {
-                        "year": {"$year": "$created_at"},
-                        "month": {"$month": "$created_at"}
-                    },
-                    "wallet_topup": {
-                        "$sum": {
-                            "$cond": [
-                                {"$eq": [{"$toString": "$type"}, "wallet_topup"]},
-                                "$amount",
-                                0
-                            ]
-                        }
-                    },
-                    "game_fee": {
-                        "$sum": {
-                            "$cond": [
-                                {"$eq": [{"$toString": "$type"}, "game_fee"]},
-                                "$amount",
-                                0
-                            ]
-                        }
-                    },
-                    "winning": {
-                        "$sum": {
-                            "$cond": [
-                                {"$eq": [{"$toString": "$type"}, "winning"]},
-                                "$amount",
-                                0
-                            ]
-                        }
-                    },
-                    "withdrawal": {
-                        "$sum": {
-                            "$cond": [
-                                {"$eq": [{"$toString": "$type"}, "withdrawal"]},
-                                "$amount",
-                                0
-                            ]
-                        }
-                    },
-                    "transaction_count": {"$sum": 1}
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$_id.year",
-                    "total_wallet_topup": {"$sum": "$wallet_topup"},
-                    "total_game_fee": {"$sum": "$game_fee"},
-                    "total_winning": {"$sum": "$winning"},
-                    "total_withdrawal": {"$sum": "$withdrawal"},
-                    "total_transactions": {"$sum": "$transaction_count"},
-                    "monthly_data": {
-                        "$push": {
-                            "month": "$_id.month",
-                            "wallet_topup": "$wallet_topup",
-                            "game_fee": "$game_fee",
-                            "winning": "$winning",
-                            "withdrawal": "$withdrawal",
-                            "transaction_count": "$transaction_count"
-                        }
-                    }
-                }
-            },
-            {
-                "$project": {
-                    "_id": 0,
-                    "year": "$_id",
-                    "total_wallet_topup": 1,
-                    "total_game_fee": 1,
-                    "total_winning": 1,
-                    "total_withdrawal": 1,
-                    "net_earnings": {
-                        "$subtract": [
-                            {"$add": ["$total_wallet_topup", "$total_game_fee"]},
-                            {"$add": ["$total_winning", "$total_withdrawal"]}
-                        ]
-                    },
-                    "total_transactions": 1,
-                    "monthly_data": 1
-                }
-            }
+        # At most 366 daily rollups, grouped per month
+        months = await monthly_totals(*year_bounds(last_year))
+        monthly_data = [
+            {"month": m, **{k: v for k, v in earnings_record(totals).items() if k != "net_earnings"}}
+            for (y, m), totals in sorted(months.items())
+            if totals["transaction_count"] > 0
         ]
         
-        result = await user_transaction_db.aggregate(pipeline).to_list(length=None)
-        
         # Add month names to monthly data
         month_names = [
             "January", "February", "March", "April", "May", "June",
             "July", "August", "September", "October", "November", "December"
         ]
         
-        if result:
-            for month_data in result[0].get("monthly_data", []):
-                month_data["month_name"] = month_names[month_data["month"] - 1]
-            
-            # Sort monthly data by month
-            result[0]["monthly_data"] = sorted(result[0]["monthly_data"], key=lambda x: x["month"])
+        for month_data in monthly_data:
+            month_data["month_name"] = month_names[month_data["month"] - 1]
+        
+        data = None
+        if monthly_data:
+            year_totals = empty_totals()
+            for totals in months.values():
+                add_totals(year_totals, totals)
+            year_totals = earnings_record(year_totals)
+            data = {
+                "year": last_year,
+                "total_wallet_topup": year_totals["wallet_topup"],
+                "total_game_fee": year_totals["game_fee"],
+                "total_winning": year_totals["winning"],
+                "total_withdrawal": year_totals["withdrawal"],
+                "net_earnings": year_totals["net_earnings"],
+                "total_transactions": year_totals["transaction_count"],
+                "monthly_data": monthly_data
+            }
         
         return {
             "last_year": last_year,
             "current_year": current_year,
-            "data": result[0] if result else {
+            "data": data if data else {
                 "year": last_year,
                 "total_wallet_topup": 0,
                 "total_game_fee": 0,
@@ -636,109 +539,31 @@ async def get_last_year_earnings(current_user: dict = Depends(get_current_user))
                 "total_transactions": 0,
                 "monthly_data": []
             },
-            "has_data": len(result) > 0
+            "has_data": data is not None
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching last year earnings: {str(e)}")
 
 
 @router.get('/last_month_earnings')
+@single_flight('last_month_earnings')
 async def get_last_month_earnings(current_user: dict = Depends(get_current_user)):
     try:
         from datetime import datetime, timedelta
         from calendar import monthrange
         
-        # Get current date
-        now = datetime.utcnow()
-        
-        # Calculate last month
-        if now.month == 1:
-            # If current month is January, last month is December of previous year
-            last_month = 12
-            last_year = now.year - 1
-        else:
-            last_month = now.month - 1
-            last_year = now.year
-        
-        # Build match condition for last month
-        match_condition = {
-            "$expr": {
-                "$and": [
-                    {"$eq": [{"$year": "$created_at"}, last_year]},
-                    {"$eq": [{"$month": "$created_at"}, last_month]}
-                ]
-            }
-        }
+        # Get current date (IST)
+        now = ist_now()
         
-        pipeline = [
-            {"$match": match_condition},
-            {
-                "$group": {
-                    "_id": {
-                        "year": {"$year": "$created_at"},
-                        "month": {"$month": "$created_at"}
-                    },
-                    "wallet_topup": {
-                        "$sum": {
-                            "$cond": [
-                                {"$eq": [{"$toString": "$type"}, "wallet_topup"]},
-                                "$amount",
-                                0
-                            ]
-                        }
-                    },
-                    "game_fee": {
-                        "$sum": {
-                            "$cond": [
-                                {"$eq": [{"$toString": "$type"}, "game_fee"]},
-                                "$amount",
-                                0
-                            ]
-                        }
-                    },
-                    "winning": {
-                        "$sum": {
-                            "$cond": [
-                                {"$eq": [{"$toString": "$type"}, "winning"]},
-                                "$amount",
-                                0
-                            ]
-                        }
-                    },
-                    "withdrawal": {
-                        "$sum": {
-                            "$cond": [
-                                {"$eq": [{"$toString": "$type"}, "withdrawal"]},
-                                "$amount",
-                                0
-                            ]
-                        }
-                    },
-                    "transaction_count": {"$sum": 1}
-                }
-            },
-            {
-                "$project": {
-                    "_id": 0,
-                    "year": "$_id.year",
-                    "month": "$_id.month",
-                    "wallet_topup": 1,
-                    "game_fee": 1,
-                    "winning": 1,
-                    "withdrawal": 1,
-                    "net_earnings": {
-                        "$subtract": [
-                            {"$add": ["$wallet_topup", "$game_fee"]},
-                            {"$add": ["$winning", "$withdrawal"]}
-                        ]
-                    },
-                    "transaction_count": 1
-                }
-            }
-        ]
+        # Calculate last month (December of previous year in January)
+        last_year, prev_month = last_month(now)
         
-        result = await user_transaction_db.aggregate(pipeline).to_list(length=None)
+        # Closed days of last month come straight from daily_txn_rollups
+        totals = await range_totals(*month_bounds(last_year, prev_month))
+        result = [{"year": last_year, "month": prev_month, **earnings_record(totals)}] if totals["transaction_count"] else []
         
         # Month names for display
         month_names = [
@@ -747,19 +572,19 @@ async def get_last_month_earnings(current_user: dict = Depends(get_current_user)
         ]
         
         # Get the number of days in last month
-        days_in_last_month = monthrange(last_year, last_month)[1]
+        days_in_last_month = monthrange(last_year, prev_month)[1]
         
         # Prepare response
         if result:
             data = result[0]
-            data["month_name"] = month_names[last_month - 1]
+            data["month_name"] = month_names[prev_month - 1]
             data["days_in_month"] = days_in_last_month
         else:
             # No transactions found for last month
             data = {
                 "year": last_year,
-                "month": last_month,
-                "month_name": month_names[last_month - 1],
+                "month": prev_month,
+                "month_name": month_names[prev_month - 1],
                 "wallet_topup": 0,
                 "game_fee": 0,
                 "winning": 0,
@@ -777,151 +602,71 @@ async def get_last_month_earnings(current_user: dict = Depends(get_current_user)
             "has_data": len(result) > 0
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching last month earnings: {str(e)}")
 
 
 @router.get('/monthly_earnings_with_period')
+@single_flight('monthly_earnings_with_period')
 async def get_monthly_earnings(
     year: Optional[int] = None,
     month: Optional[int] = None,
     period: Optional[str] = None,
+    exact: bool = False,  # True: exact distinct count (disk-backed $group) instead of the HLL estimate
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        from datetime import datetime, timedelta, timezone
-        IST = timezone(timedelta(hours=5, minutes=30))
-        now = datetime.now(IST)
+        from datetime import datetime
+        now = ist_now()
 
         if period:
-            if period == "1d":
-                start_date = datetime.combine(now.date(), datetime.min.time(), tzinfo=IST)
-                end_date = datetime.combine(now.date(), datetime.max.time(), tzinfo=IST)
-            elif period == "7d":
-                start_date = now - timedelta(days=7)
-                end_date = now
-            elif period == "30d":
-                start_date = now - timedelta(days=30)
-                end_date = now
-            elif period == "6m":
-                start_date = now - timedelta(days=180)
-                end_date = now
-            elif period == "1y":
-                start_date = now - timedelta(days=365)
-                end_date = now
-            else:
-                raise HTTPException(status_code=400, detail="Invalid period")
-
-            match_condition = {
-                "created_at": {
-                    "$gte": start_date,
-                    "$lte": end_date
-                }
-            }
-
-            pipeline = [
-                {"$match": match_condition},
-                {
-                    "$group": {
-                        "_id": None,
-                        "wallet_topup": {
-                            "$sum": {
-                                "$cond": [
-                                    {"$eq": [{"$toString": "$type"}, "wallet_topup"]},
-                                    "$amount",
-                                    0
-                                ]
-                            }
-                        },
-                        "game_fee": {
-                            "$sum": {
-                                "$cond": [
-                                    {"$eq": [{"$toString": "$type"}, "game_fee"]},
-                                    "$amount",
-                                    0
-                                ]
-                            }
-                        },
-                        "winning": {
-                            "$sum": {
-                                "$cond": [
-                                    {"$eq": [{"$toString": "$type"}, "winning"]},
-                                    "$amount",
-                                    0
-                                ]
-                            }
-                        },
-                        "withdrawal": {
-                            "$sum": {
-                                "$cond": [
-                                    {"$eq": [{"$toString": "$type"}, "withdrawal"]},
-                                    "$amount",
-                                    0
-                                ]
-                            }
-                        },
-                        "transaction_count": {"$sum": 1}
-                    }
-                },
-                {
-                    "$project": {
-                        "_id": 0,
-                        "wallet_topup": 1,
-                        "game_fee": 1,
-                        "winning": 1,
-                        "withdrawal": 1,
-                        "net_earnings": {
-                            "$subtract": [
-                                {"$add": ["$wallet_topup", "$game_fee"]},
-                                {"$add": ["$winning", "$withdrawal"]}
-                            ]
-                        },
-                        "transaction_count": 1
-                    }
-                }
-            ]
+            start_date, end_date = period_bounds(period, now)
 
-            result = await user_transaction_db.aggregate(pipeline).to_list(length=None)
+            match_condition = created_at_range(start_date, end_date)
 
             # Count active users for the period
-            user_count_pipeline = [
-                {"$match": match_condition},
-                {
-                    "$group": {
-                        "_id": None,
-                        "unique_users": {"$addToSet": "$user_id"}
-                    }
-                },
-                {"$project": {"user_count": {"$size": "$unique_users"}}}
-            ]
-            user_result = await user_transaction_db.aggregate(user_count_pipeline).to_list(length=None)
-
-            # Count new users created in this period
-            new_users_count = await user_db.count_documents({
-                "created_at": {"$gte": start_date, "$lte": end_date},
-                "role": "user",
-                "is_verified": True
-            })
-
-            earnings_data = result[0] if result else {
-                "wallet_topup": 0,
-                "game_fee": 0,
-                "winning": 0,
-                "withdrawal": 0,
-                "net_earnings": 0,
-                "transaction_count": 0,
-            }
+            if exact:
+                # One group key per user, spilled to disk if needed; never a single in-memory set
+                user_count_pipeline = [
+                    {"$match": match_condition},
+                    {"$group": {"_id": "$user_id"}},
+                    {"$count": "user_count"}
+                ]
+                active_users_query = analytics_transaction_db.aggregate(
+                    user_count_pipeline, allowDiskUse=True, maxTimeMS=max_time_ms()
+                ).to_list(length=None)
+            else:
+                # HyperLogLog: merged daily sketches from daily_txn_rollups, constant memory
+                active_users_query = distinct_users(start_date, end_date)
+            # Earnings (whole days from daily_txn_rollups, partial edge days from raw data),
+            # active users and new users are independent: run all three at once
+            totals, user_result, new_users_count = await fanout(
+                FanoutQuery(range_totals(start_date, end_date), name="earnings"),
+                FanoutQuery(active_users_query, name="active_users"),
+                FanoutQuery(analytics_user_db.count_documents(
+                    created_at_range(start_date, end_date, role="user", is_verified=True), maxTimeMS=max_time_ms()
+                ), name="new_users"),
+            )
+
+            earnings_data = earnings_record(totals)
 
             return {
                 "period": period,
                 "start_date": start_date.isoformat(),
                 "end_date": end_date.isoformat(),
-                "active_users": user_result[0]["user_count"] if user_result else 0,
+                "active_users": (user_result[0]["user_count"] if user_result else 0) if exact else user_result.count(),
+                "active_users_exact": exact,
+                # Relative standard error of the estimate; ~95% of estimates are within twice this
+                "active_users_standard_error": 0 if exact else HLL_STANDARD_ERROR,
                 "new_users": new_users_count,
                 "revenue": earnings_data["net_earnings"],
                 "data": earnings_data,
             }
 
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         print("ERROR in /monthly_earnings_with_period:", traceback.format_exc())
@@ -929,6 +674,7 @@ async def get_monthly_earnings(
 
 
 @router.get('/monthly_user_growth')
+@single_flight('monthly_user_growth')
 async def get_monthly_user_growth(
     year: Optional[int] = None,
     current_user: dict = Depends(get_current_user)
@@ -938,23 +684,18 @@ async def get_monthly_user_growth(
         
         # If year not provided, use current year
         if year is None or year == 0:
-            year = datetime.utcnow().year
+            year = ist_now().year
         
         # Match users created in the specified year
-        match_condition = {
-            "$expr": {
-                "$eq": [{"$year": "$created_at"}, year]
-            },
-            "role": {"$ne": "admin"}  # Exclude admin users
-        }
+        match_condition = year_match(year, role={"$ne": "admin"})  # Exclude admin users
         
         pipeline = [
             {"$match": match_condition},
             {
                 "$group": {
                     "_id": {
-                        "year": {"$year": "$created_at"},
-                        "month": {"$month": "$created_at"}
+                        "year": date_part("$year"),
+                        "month": date_part("$month")
                     },
                     "user_count": {"$sum": 1}
                 }
@@ -970,7 +711,7 @@ async def get_monthly_user_growth(
             {"$sort": {"month": 1}}
         ]
         
-        result = await user_db.aggregate(pipeline).to_list(length=None)
+        result = await analytics_user_db.aggregate(pipeline).to_list(length=None)
         
         # Add month names
         month_names = [
@@ -987,10 +728,13 @@ async def get_monthly_user_growth(
             "total_users": sum(r["user_count"] for r in result)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
     
 @router.get('/monthly_combined_data')
+@single_flight('monthly_combined_data')
 async def get_monthly_combined_data(
     year: Optional[int] = None,
     current_user: dict = Depends(get_current_user)
@@ -999,51 +743,10 @@ async def get_monthly_combined_data(
         from datetime import datetime
         
         if year is None or year == 0:
-            year = datetime.utcnow().year
-        
-        # Get user growth data
-        user_pipeline = [
-            {
-                "$match": {
-                    "$expr": {"$eq": [{"$year": "$created_at"}, year]},
-                    "role": {"$ne": "admin"}
-                }
-            },
-            {
-                "$group": {
-                    "_id": {"month": {"$month": "$created_at"}},
-                    "user_count": {"$sum": 1}
-                }
-            },
-            {"$sort": {"_id.month": 1}}
-        ]
-        
-        # Get revenue data
-        revenue_pipeline = [
-            {
-                "$match": {
-                    "$expr": {"$eq": [{"$year": "$created_at"}, year]}
-                }
-            },
-            {
-                "$group": {
-                    "_id": {"month": {"$month": "$created_at"}},
-                    "wallet_topup": {
-                        "$sum": {
-                            "$cond": [
-                                {"$eq": [{"$toString": "$type"}, "wallet_topup"]},
-                                "$amount",
-                                0
-                            ]
-                        }
-                    }
-                }
-            },
-            {"$sort": {"_id.month": 1}}
-        ]
+            year = ist_now().year
         
-        user_data = await user_db.aggregate(user_pipeline).to_list(length=None)
-        revenue_data = await user_transaction_db.aggregate(revenue_pipeline).to_list(length=None)
+        # User growth and revenue per month from daily_txn_rollups (+ today's live tail)
+        months = await monthly_totals(*year_bounds(year))
         
         # Month names
         month_names = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", 
@@ -1052,14 +755,13 @@ async def get_monthly_combined_data(
         # Combine data for all 12 months
         combined_data = []
         for month_num in range(1, 13):
-            user_record = next((u for u in user_data if u["_id"]["month"] == month_num), None)
-            revenue_record = next((r for r in revenue_data if r["_id"]["month"] == month_num), None)
+            totals = months.get((year, month_num))
             
             combined_data.append({
                 "month": month_names[month_num - 1],
                 "month_number": month_num,
-                "users": user_record["user_count"] if user_record else 0,
-                "revenue": revenue_record["wallet_topup"] if revenue_record else 0
+                "users": totals["new_users"].get("user", 0) if totals else 0,  # Non-admin users
+                "revenue": totals["wallet_topup"] if totals else 0
             })
         
         return {
@@ -1067,6 +769,23 @@ async def get_monthly_combined_data(
             "data": combined_data
         }
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    
+@router.get('/dashboard')
+@single_flight('dashboard')
+async def get_dashboard(
+    year: Optional[int] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """all_wallet_data, todays_earnings, monthly_earnings, monthly_user_growth and
+    monthly_combined_data in one response: closed days from rollups, today and signups raw, run concurrently"""
+    try:
+        return await dashboard(year=year or None)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
     
@@ -1082,15 +801,35 @@ async def create_recharge_pack(pack: RechargePackCreate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    if not if_none_match or not etag:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
 @router.get("/get-recharge-packs")
-async def get_recharge_packs(active_only: bool = Query(True)):
+async def get_recharge_packs(request: Request, active_only: bool = Query(True)):
     """Get all recharge packs (for frontend to display)"""
     try:
-        packs = await get_all_packs(active_only=active_only)
-        return {"success": True, "data": packs, "count": len(packs)}
+        if_none_match = request.headers.get("if-none-match")
+        # Revalidation against the cached catalog: 304 without any DB work
+        if _etag_matches(if_none_match, cached_catalog_etag(active_only)):
+            record_not_modified()
+            return Response(status_code=304, headers={"ETag": cached_catalog_etag(active_only)})
+        body, etag = await get_catalog(active_only=active_only)
+        if _etag_matches(if_none_match, etag):
+            record_not_modified()
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=body, media_type="application/json",
+                        headers={"ETag": etag, "Cache-Control": "no-cache"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/pack_catalog_stats")
+async def get_pack_catalog_stats(current_user: dict = Depends(get_current_user)):
+    """Hit/miss/304 counters and version stamp of the recharge pack catalog cache"""
+    return catalog_stats()
+
 @router.get("/packs/{pack_id}")
 async def get_recharge_pack(pack_id: str):
     """Get a specific pack by pack_id"""
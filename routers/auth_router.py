@@ -7,12 +7,15 @@ from schemas.auth_schema import LoginUser, LoginResponse, CreateUser, UserRespon
 from services.auth_service import send_otp
 
 from services.auth_service import get_user_by_email, create_user, get_user_by_mobile
-from utils.auth_util import verify_password, create_token, create_token_for_mobile
+from utils.auth_util import create_token, create_token_for_mobile
+from services.password_service import verify_password_async
 from config.google_oauth2 import oauth
-from utils.otp_store import otp_store, otp_lookup
+from utils.otp_store import otp_store
+from utils.user_cache import invalidate_user
 from database.db import user_db
 from fastapi import Depends
 from services.auth_service import generate_otp
+from services.rollup_service import record_new_user
 
 # JWT_SECRET = os.getenv("JWT_SECRET","")
 JWT_SECRET = os.getenv("SECRET_KEY")
@@ -37,7 +40,7 @@ async def signin(user: LoginUser):
     if not existing_user:
         raise HTTPException(status_code=401, detail='User not found.')
     
-    isPasswordVerified = verify_password(user.password, existing_user['password'])
+    isPasswordVerified = await verify_password_async(user.password, existing_user['password'])
     
     if not isPasswordVerified:
         raise HTTPException(status_code=401, detail="Password didn't matched.")
@@ -158,35 +161,31 @@ async def requestOTP(request: SendOTPRequest):
     # Implement OTP sending logic here (e.g., using Twilio, Nexmo, etc.)
     existing_user = await get_user_by_mobile(request.mobile_number)
     otp=generate_otp()
-    otp_store[request.mobile_number] = {"otp": otp, "name": request.name}
-    
-    otp_lookup[otp] = request.mobile_number  # Store the mapping of OTP to mobile number
+    await otp_store.save(request.mobile_number, otp, {"name": request.name})  # Expires after OTP_TTL_SECONDS
     
     if existing_user:
         return {"message": "OTP sent", "is_new_user": False, "otp": otp}
     else:
         # New user - REGISTER case
-        await user_db.insert_one({
+        new_user = {
             "name": request.name,
             "mobile_number": request.mobile_number,
             "role": request.role,
             "created_at": datetime.utcnow(),
-        })
+        }
+        await user_db.insert_one(new_user)
+        await record_new_user(new_user["created_at"], new_user["role"])
         return {"message": "OTP sent", "is_new_user": True, "otp": otp}
 
 @router.post("/verify-otp")
 async def verify_otp(data: VerifyOTPRequest):
 
-    # Step 1: Find mobile number using OTP
-    mobile_number = otp_lookup.get(data.otp)
-    if not mobile_number:
+    # Step 1 + 2: Match (mobile_number, otp) and consume it in one step
+    mobile_number = data.mobile_number
+    info = await otp_store.consume(mobile_number, data.otp)
+    if not info:
         raise HTTPException(status_code=400, detail="Invalid or expired OTP")
 
-    # Step 2: Fetch OTP info using mobile number
-    info = otp_store.get(mobile_number)
-    if not info or info["otp"] != data.otp:
-        raise HTTPException(status_code=400, detail="Invalid OTP")
-
     # Step 3: Check if user exists
     existing_user = await user_db.find_one({"mobile_number": mobile_number})
     if existing_user:
@@ -194,6 +193,7 @@ async def verify_otp(data: VerifyOTPRequest):
             {"mobile_number": mobile_number},
             {"$set": {"is_verified": True}}
         )
+        invalidate_user(existing_user["_id"])
         user_data = existing_user
     else:
         user_data = {
@@ -204,12 +204,9 @@ async def verify_otp(data: VerifyOTPRequest):
             "created_at": datetime.utcnow(),
         }
         await user_db.insert_one(user_data)
+        await record_new_user(user_data["created_at"], user_data["role"])
 
-    # Step 4: Clear OTP after success
-    otp_store.pop(mobile_number, None)
-    otp_lookup.pop(data.otp, None)
-
-    # Step 5: Generate token
+    # Step 4: Generate token
     token = create_token_for_mobile(user_data)
 
     return {
@@ -3,21 +3,73 @@ from utils.auth_util import  get_current_user
 from bson.errors import InvalidId
 from bson import ObjectId
 from datetime import datetime
+from pydantic import ValidationError
+from typing import Optional
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from database.db import user_transaction_db
-from schemas.user_transaction_schema import TransactionCreate,TransactionResponse
+from schemas.user_transaction_schema import TransactionCreate,TransactionResponse,TransactionBulkCreate,TransactionBulkItemResult,TransactionBulkResponse
+from services.txn_writer import txn_writer, update_derived
+from utils.idempotency_cache import get_cached_transaction, remember_transaction, record_db_duplicate
 
 router=APIRouter(prefix='/api/v1/user', tags=['User'])
 
 
+def _user_object_id(current_user: dict) -> ObjectId:
+    # get_current_user returns the user document; "sub" is only present on a raw token payload
+    user_id = current_user.get('sub', current_user.get('_id'))
+    try:
+        return ObjectId(user_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid user ID format")
+
+
+def _utcnow_ms() -> datetime:
+    # BSON dates keep milliseconds; truncating up front makes a retry's response match the original byte for byte
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def _transaction_response(txn_doc: dict) -> TransactionResponse:
+    return TransactionResponse(
+        transaction_id=str(txn_doc["_id"]),
+        amount=txn_doc["amount"],
+        type=txn_doc["type"],
+        reference_id=txn_doc["reference_id"],
+        created_at=txn_doc["created_at"]
+    )
+
+
+async def _original_transaction(user_object_id: ObjectId, reference_id: str) -> Optional[TransactionResponse]:
+    """The transaction an earlier request with the same reference_id wrote (served by user_id_reference_id_unique)"""
+    txn_doc = await user_transaction_db.find_one({"user_id": user_object_id, "reference_id": reference_id})
+    if txn_doc is None:
+        return None
+    response = _transaction_response(txn_doc)
+    remember_transaction(user_object_id, reference_id, response.model_dump())
+    return response
+
+
+def _replay_conflict(original: TransactionResponse, amount: float, txn_type: str) -> Optional[str]:
+    """Why a request reusing original's reference_id is not a retry of it, or None if it is"""
+    if original.type != txn_type or original.amount != amount:
+        return (f"reference_id {original.reference_id!r} was already used for a "
+                f"{original.type.value} of {original.amount}")
+    return None
+
+
 @router.post('/create_transaction',response_model=TransactionResponse)
 async def create_transactions(transaction:TransactionCreate, current_user:dict=Depends(get_current_user)):
-    user_id=current_user['sub']
     # user_id=current_user['user_id']
-    
-    try:
-        user_object_id = ObjectId(user_id)
-    except InvalidId:
-        raise HTTPException(status_code=400, detail="Invalid user ID format")
+    user_object_id = _user_object_id(current_user)
+    # Retried request: answer with the original transaction, no second write
+    cached = get_cached_transaction(user_object_id, transaction.reference_id)
+    if cached is not None:
+        original = TransactionResponse(**cached)
+        # Same reference_id but a different payload is a client bug, not a retry
+        conflict = _replay_conflict(original, transaction.amount, transaction.type)
+        if conflict:
+            raise HTTPException(status_code=409, detail=conflict)
+        return original
     txn_doc={
         # "user_id":ObjectId(user_id),
         "user_id": user_object_id,
@@ -25,24 +77,120 @@ async def create_transactions(transaction:TransactionCreate, current_user:dict=D
         # "type": transaction.type,
         "type": transaction.type.value,#edited by copilot
         "reference_id": transaction.reference_id,
-        "created_at": datetime.utcnow()
+        "created_at": _utcnow_ms()
     }
     
     try:
-        # Insert into database
-        result = await user_transaction_db.insert_one(txn_doc)
+        # Coalesced with concurrent requests into one insert_many; the writer also
+        # keeps user_balances and daily_txn_rollups in step before resolving
+        inserted_id = await txn_writer.submit(txn_doc)
         
         # Return response
-        return TransactionResponse(
-            transaction_id=str(result.inserted_id),
+        response = TransactionResponse(
+            transaction_id=str(inserted_id),
             amount=transaction.amount,
             type=transaction.type,
             reference_id=transaction.reference_id,
             created_at=txn_doc["created_at"]
         )
+        remember_transaction(user_object_id, transaction.reference_id, response.model_dump())
+        return response
+    except DuplicateKeyError:
+        # Retry that missed this process's cache (other worker, restart or concurrent request)
+        record_db_duplicate()
+        original = await _original_transaction(user_object_id, transaction.reference_id)
+        if original is None:
+            raise HTTPException(status_code=409, detail="Duplicate transaction")
+        conflict = _replay_conflict(original, transaction.amount, transaction.type)
+        if conflict:
+            raise HTTPException(status_code=409, detail=conflict)
+        return original
     except Exception as e:
         print(f"Error creating transaction: {str(e)}")
         raise HTTPException(
             status_code=500, 
             detail=f"Failed to create transaction: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.post('/create_transactions_bulk',response_model=TransactionBulkResponse)
+async def create_transactions_bulk(payload:TransactionBulkCreate, current_user:dict=Depends(get_current_user)):
+    """Insert up to BULK_TRANSACTION_MAX_ITEMS transactions with one unordered insert_many"""
+    user_object_id = _user_object_id(current_user)
+    now = _utcnow_ms()
+    results = [None] * len(payload.items)
+    txn_docs = []
+    txn_indexes = []  # position in payload.items of each txn_doc
+
+    # Validate every item; invalid ones are reported, the rest still get written
+    for index, item in enumerate(payload.items):
+        try:
+            transaction = TransactionCreate.model_validate(item)
+        except ValidationError as e:
+            errors = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            results[index] = TransactionBulkItemResult(index=index, success=False, error=errors)
+            continue
+        cached = get_cached_transaction(user_object_id, transaction.reference_id)
+        if cached is not None:
+            original = TransactionResponse(**cached)
+            conflict = _replay_conflict(original, transaction.amount, transaction.type)
+            if conflict:
+                results[index] = TransactionBulkItemResult(index=index, success=False, error=conflict)
+            else:
+                results[index] = TransactionBulkItemResult(index=index, success=True, transaction=original)
+            continue
+        txn_docs.append({
+            "user_id": user_object_id,
+            "amount": transaction.amount,
+            "type": transaction.type.value,
+            "reference_id": transaction.reference_id,
+            "created_at": now
+        })
+        txn_indexes.append(index)
+
+    write_errors = {}
+    if txn_docs:
+        try:
+            # insert_many assigns _id to every doc before sending, so ids are known even on partial failure
+            await user_transaction_db.insert_many(txn_docs, ordered=False)
+        except BulkWriteError as e:
+            write_errors = {err["index"]: (err.get("code"), err.get("errmsg", "write failed")) for err in e.details.get("writeErrors", [])}
+        except Exception as e:
+            print(f"Error creating transactions: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to create transactions: {str(e)}"
+            )
+
+    inserted_docs = []
+    for position, (index, txn_doc) in enumerate(zip(txn_indexes, txn_docs)):
+        if position in write_errors:
+            code, errmsg = write_errors[position]
+            original = None
+            if code == 11000:
+                record_db_duplicate()
+                original = await _original_transaction(user_object_id, txn_doc["reference_id"])
+            conflict = None
+            if original is not None:
+                conflict = _replay_conflict(original, txn_doc["amount"], txn_doc["type"])
+            if original is not None and not conflict:
+                results[index] = TransactionBulkItemResult(index=index, success=True, transaction=original)
+            else:
+                results[index] = TransactionBulkItemResult(index=index, success=False, error=conflict or errmsg)
+            continue
+        inserted_docs.append(txn_doc)
+        response = _transaction_response(txn_doc)
+        remember_transaction(user_object_id, txn_doc["reference_id"], response.model_dump())
+        results[index] = TransactionBulkItemResult(index=index, success=True, transaction=response)
+
+    # One ledger $inc and one rollup $inc per day for the whole batch; the rows are
+    # committed, so a failure here is logged and the per-item results still stand
+    await update_derived(inserted_docs)
+
+    failed = sum(1 for result in results if not result.success)
+    return TransactionBulkResponse(
+        inserted=len(inserted_docs),
+        duplicates=len(payload.items) - len(inserted_docs) - failed,
+        failed=failed,
+        results=results
+    )
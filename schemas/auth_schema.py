@@ -137,11 +137,12 @@ class OTPResponse(BaseModel):
     )
     
 class VerifyOTPRequest(BaseModel):
-    # mobile_number:Optional[str]=Field(..., min_length=10, max_length=10)
+    mobile_number:str=Field(..., min_length=10, max_length=10)  # OTPs are only unique per mobile number
     otp:str=Field(min_length=4, max_length=4)
     model_config=ConfigDict(
         json_schema_extra={
             "example": {
+                "mobile_number": "9876543210",
                 "otp": "0000"
             }
         }
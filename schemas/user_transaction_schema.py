@@ -3,7 +3,8 @@ from bson import ObjectId
 from datetime import datetime,timezone
 from enum import Enum
 from models.user_model import PyObjectId
-from typing import Optional
+from typing import Any, Dict, List, Optional
+import os
 
 
 class TransactionType(str, Enum):
@@ -78,4 +79,36 @@ class UserTransaction(BaseModel):
                 "created_at": "2025-10-06T12:00:00"
             }
         }
-    )
\ No newline at end of file
+    )
+
+BULK_TRANSACTION_MAX_ITEMS = int(os.getenv("BULK_TRANSACTION_MAX_ITEMS", 500))
+
+class TransactionBulkCreate(BaseModel):
+    """Schema for creating many transactions in one call (request body)"""
+    # Items are validated one by one in the handler so one bad row doesn't reject the batch
+    items: List[Dict[str, Any]] = Field(..., min_length=1, max_length=BULK_TRANSACTION_MAX_ITEMS)
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "items": [
+                    {"amount": 10.0, "type": "game_fee", "reference_id": "round_981_fee"},
+                    {"amount": 25.0, "type": "winning", "reference_id": "round_981_win"}
+                ]
+            }
+        }
+    )
+
+class TransactionBulkItemResult(BaseModel):
+    """Outcome of one item of a bulk create, in request order"""
+    index: int
+    success: bool
+    transaction: Optional[TransactionResponse] = None
+    error: Optional[str] = None
+
+class TransactionBulkResponse(BaseModel):
+    """Schema for bulk create response"""
+    inserted: int
+    duplicates: int = 0  # Items whose reference_id was already written; their result carries the original
+    failed: int
+    results: List[TransactionBulkItemResult]
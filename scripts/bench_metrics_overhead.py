@@ -0,0 +1,107 @@
+"""Throughput cost of RequestMetricsMiddleware (utils/request_metrics.py)
+
+Serves the same FastAPI app with and without the middleware through an in-process ASGI
+transport (no sockets, no Mongo) and compares requests/second. The handlers do no work, so
+this is the worst case: with real handlers the relative overhead only gets smaller.
+
+End-to-end throughput varies by a few percent between rounds, more than the middleware
+costs, so the middleware's own time per request (around a no-op ASGI app) is measured
+separately and reported as a share of one plain request.
+
+Usage (PowerShell):
+    python .\\scripts\\bench_metrics_overhead.py --n 20000 --rounds 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def build_app(instrumented: bool):
+    from fastapi import FastAPI
+    from utils.request_metrics import RequestMetricsMiddleware
+
+    app = FastAPI()
+
+    @app.get("/api/v1/static")
+    async def static_route():
+        return {"ok": True}
+
+    @app.get("/api/v1/items/{item_id}")
+    async def dynamic_route(item_id: str):
+        return {"id": item_id}
+
+    if instrumented:
+        app.add_middleware(RequestMetricsMiddleware)
+    return app
+
+
+async def throughput(app, n: int, concurrency: int) -> float:
+    import httpx
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker(count: int):
+            for i in range(count):
+                # One in ten requests hits the uncached (dynamic) route lookup
+                await client.get(f"/api/v1/items/{i}" if i % 10 == 0 else "/api/v1/static")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(n // concurrency) for _ in range(concurrency)))
+        return n / (time.perf_counter() - start)
+
+
+async def middleware_cost_us(app, n: int) -> float:
+    """Time the middleware adds per request around a no-op ASGI app, in microseconds"""
+    from utils.request_metrics import RequestMetricsMiddleware
+
+    async def noop_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    async def per_request(asgi_app, path: str) -> float:
+        scope = {"type": "http", "method": "GET", "path": path, "root_path": "", "app": app}
+        start = time.perf_counter()
+        for _ in range(n):
+            await asgi_app(scope, receive, send)
+        return (time.perf_counter() - start) / n * 1e6
+
+    wrapped = RequestMetricsMiddleware(noop_app)
+    costs = [await per_request(wrapped, path) - await per_request(noop_app, path)
+             for path in ("/api/v1/static", "/api/v1/items/42")]
+    return 0.9 * costs[0] + 0.1 * costs[1]  # Same static/dynamic mix as the throughput run
+
+
+async def run(n: int, rounds: int, concurrency: int):
+    plain, instrumented = build_app(False), build_app(True)
+    await throughput(plain, 1000, concurrency)  # Warm up both
+    await throughput(instrumented, 1000, concurrency)
+    results = {"plain": [], "instrumented": []}
+    for _ in range(rounds):  # Interleaved so drift affects both sides alike
+        results["plain"].append(await throughput(plain, n, concurrency))
+        results["instrumented"].append(await throughput(instrumented, n, concurrency))
+    base, with_metrics = statistics.median(results["plain"]), statistics.median(results["instrumented"])
+    print(f"n={n} x {rounds} rounds, concurrency {concurrency}")
+    print(f"plain          {base:9.0f} req/s")
+    print(f"instrumented   {with_metrics:9.0f} req/s")
+    print(f"overhead       {(1 - with_metrics / base) * 100:8.2f} %  (end to end, noisy)")
+    cost = await middleware_cost_us(instrumented, n)
+    print(f"middleware     {cost:8.2f} us/request = {cost / (1e6 / base) * 100:.2f} % of a plain request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.n, args.rounds, args.concurrency))
@@ -0,0 +1,56 @@
+"""Benchmark send-then-verify throughput of the OTP store backends
+
+Each iteration saves an OTP for a fresh mobile number (send-otp), then consumes
+it by (mobile_number, otp) (verify-otp), mirroring auth_router.
+
+Usage (PowerShell):
+    python .\\scripts\\bench_otp_store.py --backend memory --n 100000
+    python .\\scripts\\bench_otp_store.py --backend mongo --n 5000 --concurrency 50
+
+The mongo backend reads MONGODB_URL and DATABASE from env and uses the otp_codes collection.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.otp_store import create_otp_store
+
+
+async def send_then_verify(store, mobile_number: str) -> bool:
+    otp = str(random.randint(1000, 9999))
+    await store.save(mobile_number, otp, {"name": "bench"})
+    info = await store.consume(mobile_number, otp)
+    return info is not None and info["otp"] == otp
+
+
+async def run(backend: str, n: int, concurrency: int):
+    store = create_otp_store(backend)
+    await store.ensure_indexes()
+    semaphore = asyncio.Semaphore(concurrency)
+    base = 6000000000 + random.randint(0, 10**8)
+
+    async def one(i: int):
+        async with semaphore:
+            return await send_then_verify(store, str(base + i))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(n)))
+    elapsed = time.perf_counter() - start
+
+    print(f"backend={backend} n={n} concurrency={concurrency}")
+    print(f"elapsed={elapsed:.3f}s throughput={n / elapsed:,.0f} send+verify/s")
+    print(f"mismatched verifications: {results.count(False)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["memory", "mongo"], default="memory")
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.backend, args.n, args.concurrency))
@@ -0,0 +1,115 @@
+"""Latency micro-benchmark: recharge pack mutations, before vs after single-round-trip rework
+
+- create: find (duplicate check) + insert_one + version bump  vs  insert_one relying on pack_id_unique
+- update: find + update_one + find + version bump            vs  find_one_and_update(ReturnDocument.AFTER)
+
+Both sides include the catalog cache invalidation: "before" $inc's a shared stamp in a
+cache_versions collection (one more round trip per write), "after" stamps catalog_version
+on the pack inside the same write, as services/recharge_service.py does. Calls run
+sequentially, so the numbers are the full per-mutation latency against the given mongod.
+Runs in a scratch database (dropped afterwards).
+
+Usage (PowerShell):
+    python .\\scripts\\bench_pack_mutations.py --n 2000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def report(name: str, samples: list):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{name:<28} p50 {statistics.median(samples) * 1000:7.3f} ms   p99 {p99 * 1000:7.3f} ms")
+
+
+async def timed(samples: list, coro):
+    start = time.perf_counter()
+    await coro
+    samples.append(time.perf_counter() - start)
+
+
+async def run(n: int):
+    from bson import ObjectId
+    from pymongo import ReturnDocument
+    from pymongo.errors import DuplicateKeyError
+    from database.db import client, database_name, db, recharge_pack_db
+    from database.indexes import ensure_collection_indexes
+
+    def pack(i: int, prefix: str) -> dict:
+        now = datetime.utcnow()
+        return {"pack_id": f"{prefix}_{i}", "name": f"Pack {i}", "price": 99.0, "spins": 10,
+                "discount_percentage": 0, "display_order": i, "is_active": True,
+                "created_at": now, "updated_at": now}
+
+    versions = db.get_collection("cache_versions")
+
+    async def bump_version():
+        await versions.find_one_and_update(
+            {"_id": "recharge_packs"}, {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True, return_document=ReturnDocument.AFTER,
+        )
+
+    async def create_before(doc):
+        if await recharge_pack_db.find_one({"pack_id": doc["pack_id"]}):
+            raise ValueError("exists")
+        await recharge_pack_db.insert_one(doc)
+        await bump_version()
+
+    async def create_after(doc):
+        try:
+            await recharge_pack_db.insert_one({**doc, "catalog_version": ObjectId()})
+        except DuplicateKeyError:
+            raise ValueError("exists")
+
+    async def update_before(pack_id, i):
+        if not await recharge_pack_db.find_one({"pack_id": pack_id}):
+            raise ValueError("not found")
+        await recharge_pack_db.update_one({"pack_id": pack_id}, {"$set": {"price": float(i), "updated_at": datetime.utcnow()}})
+        doc = await recharge_pack_db.find_one({"pack_id": pack_id})
+        await bump_version()
+        return doc
+
+    async def update_after(pack_id, i):
+        doc = await recharge_pack_db.find_one_and_update(
+            {"pack_id": pack_id},
+            {"$set": {"price": float(i), "updated_at": datetime.utcnow(), "catalog_version": ObjectId()}},
+            projection={"catalog_version": 0}, return_document=ReturnDocument.AFTER,
+        )
+        if not doc:
+            raise ValueError("not found")
+        return doc
+
+    try:
+        await client.drop_database(database_name)
+        await ensure_collection_indexes("recharge_packs")
+        results = {name: [] for name in ("create (find+ins+bump)", "create (insert)",
+                                         "update (find+upd+find+bump)", "update (find_one_and_update)")}
+        for i in range(n):
+            await timed(results["create (find+ins+bump)"], create_before(pack(i, "before")))
+            await timed(results["create (insert)"], create_after(pack(i, "after")))
+        for i in range(n):
+            await timed(results["update (find+upd+find+bump)"], update_before(f"before_{i}", i))
+            await timed(results["update (find_one_and_update)"], update_after(f"after_{i}", i))
+
+        print(f"n={n} (sequential, interleaved)")
+        for name, samples in results.items():
+            report(name, samples)
+    finally:
+        await client.drop_database(database_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--database", default="bench_recharge_packs", help="Scratch database, dropped afterwards")
+    args = parser.parse_args()
+    os.environ["DATABASE"] = args.database  # Must be set before database.db is imported
+    asyncio.run(run(args.n))
@@ -0,0 +1,102 @@
+"""Benchmark single-insert vs bulk transaction ingestion
+
+Replays what the two endpoints do against MongoDB, including the user_balances and
+daily_txn_rollups updates:
+- single: insert_one + ledger $inc + rollup $inc per transaction (create_transaction)
+- bulk:   one unordered insert_many + one ledger $inc + one rollup $inc per batch
+          (create_transactions_bulk)
+- coalesced: one request per transaction through the write-coalescer (create_transaction)
+
+Runs in a scratch database (dropped afterwards).
+
+Usage (PowerShell):
+    python .\\scripts\\bench_transaction_insert.py --n 20000 --batch-size 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TYPES = ["wallet_topup", "game_fee", "winning", "withdrawal"]
+
+
+def make_docs(user_id, n: int) -> list:
+    now = datetime.utcnow()
+    return [
+        {"user_id": user_id, "amount": float(random.randint(1, 500)), "type": random.choice(TYPES),
+         "reference_id": f"bench_{i}", "created_at": now}
+        for i in range(n)
+    ]
+
+
+async def run(n: int, batch_size: int, concurrency: int):
+    from bson import ObjectId
+    from database.db import client, database_name, user_transaction_db
+    from services.ledger_service import apply_transaction, apply_transactions
+    from services.rollup_service import record_transaction, record_transactions
+    from services.txn_writer import TransactionWriter
+
+    user_id = ObjectId()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def single(doc):
+        async with semaphore:
+            await user_transaction_db.insert_one(doc)
+            await apply_transaction(user_id, doc["type"], doc["amount"])
+            await record_transaction(doc["created_at"], doc["type"], doc["amount"], user_id)
+
+    async def bulk(docs):
+        async with semaphore:
+            await user_transaction_db.insert_many(docs, ordered=False)
+            await apply_transactions(user_id, docs)
+            await record_transactions(docs)
+
+    try:
+        await client.drop_database(database_name)
+        docs = make_docs(user_id, n)
+        start = time.perf_counter()
+        await asyncio.gather(*(single(doc) for doc in docs))
+        single_elapsed = time.perf_counter() - start
+
+        docs = make_docs(user_id, n)
+        batches = [docs[i:i + batch_size] for i in range(0, n, batch_size)]
+        start = time.perf_counter()
+        await asyncio.gather(*(bulk(batch) for batch in batches))
+        bulk_elapsed = time.perf_counter() - start
+
+        writer = TransactionWriter()
+        docs = make_docs(user_id, n)
+
+        async def coalesced(doc):
+            async with semaphore:
+                await writer.submit(doc)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(coalesced(doc) for doc in docs))
+        await writer.close()
+        coalesced_elapsed = time.perf_counter() - start
+
+        print(f"n={n} batch_size={batch_size} concurrency={concurrency}")
+        print(f"single: {single_elapsed:.3f}s  {n / single_elapsed:,.0f} txn/s")
+        print(f"bulk:   {bulk_elapsed:.3f}s  {n / bulk_elapsed:,.0f} txn/s  ({single_elapsed / bulk_elapsed:.1f}x)")
+        print(f"coalesced: {coalesced_elapsed:.3f}s  {n / coalesced_elapsed:,.0f} txn/s  ({single_elapsed / coalesced_elapsed:.1f}x)"
+              f"  avg batch {writer.batch_size.snapshot()['avg']:.1f}")
+    finally:
+        await client.drop_database(database_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--database", default="bench_transactions", help="Scratch database, dropped afterwards")
+    args = parser.parse_args()
+    os.environ["DATABASE"] = args.database  # Must be set before database.db is imported
+    asyncio.run(run(args.n, args.batch_size, args.concurrency))
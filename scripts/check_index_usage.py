@@ -0,0 +1,88 @@
+"""Check that every analytics date filter is served by an index (IXSCAN, no COLLSCAN)
+
+Builds the same created_at filters the admin analytics endpoints use (utils/query_builder),
+runs `explain` on a $match + $group pipeline for each against a local mongod, and
+fails if any winning plan is a collection scan.
+
+Runs in a scratch database (dropped afterwards) so it never touches real data.
+
+Usage (PowerShell):
+    python .\\scripts\\check_index_usage.py
+    python .\\scripts\\check_index_usage.py --url mongodb://localhost:27017 --database ixscan_check
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from database.indexes import INDEXES
+from database.monitoring import plan_stages
+from utils.query_builder import created_at_range, day_bounds, period_bounds, year_match
+
+
+def analytics_filters(now: datetime):
+    today_start, today_end = day_bounds(now)
+    period_start, period_end = period_bounds("30d")
+    return [
+        ("todays_earnings", "user_transactions", created_at_range(today_start, today_end)),
+        ("monthly_earnings year", "user_transactions", year_match(now.year)),
+        ("monthly_earnings month", "user_transactions", year_match(now.year, now.month)),
+        ("last_year_earnings", "user_transactions", year_match(now.year - 1)),
+        ("monthly_earnings_with_period", "user_transactions", created_at_range(period_start, period_end)),
+        ("users_added_today", "users", created_at_range(today_start, today_end)),
+        ("monthly_user_growth", "users", year_match(now.year, role={"$ne": "admin"})),
+        ("new_users in period", "users", created_at_range(period_start, period_end, role="user", is_verified=True)),
+    ]
+
+
+async def seed(db, now: datetime, n: int):
+    types = ["wallet_topup", "game_fee", "winning", "withdrawal"]
+    await db.user_transactions.insert_many([
+        {"type": random.choice(types), "amount": 10, "created_at": now - timedelta(days=random.randint(0, 800))}
+        for _ in range(n)
+    ])
+    await db.users.insert_many([
+        {"role": "user", "is_verified": True, "created_at": now - timedelta(days=random.randint(0, 800))}
+        for _ in range(n)
+    ])
+    # The same indexes the app creates on startup
+    await db.user_transactions.create_indexes(INDEXES["user_transactions"])
+    await db.users.create_indexes(INDEXES["users"])
+
+
+async def run(url: str, database: str, n: int) -> bool:
+    client = AsyncIOMotorClient(url)
+    db = client[database]
+    now = datetime.utcnow()
+    ok = True
+    try:
+        await client.drop_database(database)
+        await seed(db, now, n)
+        for name, collection, match in analytics_filters(now):
+            explain = await db.command(
+                "explain",
+                {"aggregate": collection, "pipeline": [{"$match": match}, {"$group": {"_id": None, "n": {"$sum": 1}}}], "cursor": {}},
+                verbosity="queryPlanner",
+            )
+            stages = plan_stages(explain)
+            passed = "IXSCAN" in stages and "COLLSCAN" not in stages
+            ok = ok and passed
+            print(f"{'PASS' if passed else 'FAIL'}  {name:<32} {collection:<18} {sorted(stages)}")
+    finally:
+        await client.drop_database(database)
+        client.close()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=os.getenv("MONGODB_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--database", default="ixscan_check")
+    parser.add_argument("--n", type=int, default=2000, help="Documents seeded per collection")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.url, args.database, args.n)) else 1)
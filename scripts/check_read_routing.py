@@ -0,0 +1,87 @@
+"""Check that read-only analytics queries are served by secondaries
+
+Seeds a scratch database through the primary, then runs analytics-style reads through the
+analytics handles in database/db.py (ANALYTICS_READ_PREFERENCE / ANALYTICS_MAX_STALENESS_SECONDS)
+and reports which member answered each one. With secondaryPreferred and at least one
+secondary, a read answered by the primary is a failure; on a standalone or single-node
+replica set every read falls back to the primary, which is reported, not failed.
+
+Local three-member replica set (PowerShell):
+    mongod --replSet rs0 --port 27017 --dbpath .\\data\\rs0-0
+    mongod --replSet rs0 --port 27018 --dbpath .\\data\\rs0-1
+    mongod --replSet rs0 --port 27019 --dbpath .\\data\\rs0-2
+    mongosh --port 27017 --eval "rs.initiate({_id: 'rs0', members: [{_id: 0, host: 'localhost:27017'}, {_id: 1, host: 'localhost:27018'}, {_id: 2, host: 'localhost:27019'}]})"
+
+Usage (PowerShell):
+    $env:MONGODB_URL = "mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0"
+    python .\\scripts\\check_read_routing.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def run(n: int) -> bool:
+    from pymongo import WriteConcern
+    from database.db import (ANALYTICS_READ_PREFERENCE, analytics_rollup_db, analytics_transaction_db,
+                             analytics_user_db, client, database_name, db)
+
+    def address(host: str) -> tuple:
+        name, port = host.rsplit(":", 1)
+        return name, int(port)
+
+    hello = await client.admin.command("hello")
+    primary = address(hello["primary"]) if hello.get("primary") else None
+    secondaries = {address(host) for host in hello.get("hosts", [])} - {primary}
+    print(f"Read preference: {analytics_transaction_db.read_preference}")
+    print(f"Replica set: {hello.get('setName') or '-'}   primary: {primary}   secondaries: {sorted(secondaries)}")
+
+    now = datetime.utcnow()
+    majority = WriteConcern(w="majority")
+    try:
+        await client.drop_database(database_name)
+        await db.get_collection("user_transactions", write_concern=majority).insert_many([
+            {"user_id": i % 50, "type": "game_fee", "amount": 10.0, "created_at": now - timedelta(minutes=i)}
+            for i in range(n)
+        ])
+        await db.get_collection("users", write_concern=majority).insert_many([
+            {"role": "user", "created_at": now - timedelta(minutes=i)} for i in range(n)
+        ])
+        await db.get_collection("daily_txn_rollups", write_concern=majority).insert_one({"_id": now, "finalized": True})
+
+        reads = [
+            ("transactions $group", analytics_transaction_db.aggregate([{"$group": {"_id": "$type", "n": {"$sum": 1}}}])),
+            ("users $group", analytics_user_db.aggregate([{"$group": {"_id": "$role", "n": {"$sum": 1}}}])),
+            ("transactions find", analytics_transaction_db.find({}).sort("created_at", 1).batch_size(100)),
+            ("rollups find", analytics_rollup_db.find({})),
+        ]
+        ok = True
+        for name, cursor in reads:
+            await cursor.to_list(length=None)
+            served_by = cursor.address
+            on_secondary = served_by in secondaries
+            if on_secondary:
+                verdict = "PASS"
+            elif secondaries and ANALYTICS_READ_PREFERENCE == "secondaryPreferred":
+                verdict, ok = "FAIL", False
+            else:
+                verdict = "PRIMARY"  # No secondary to use, or nearest picked the primary
+            print(f"{verdict:<8} {name:<22} served by {served_by}")
+        return ok
+    finally:
+        await client.drop_database(database_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", default="read_routing_check", help="Scratch database, dropped afterwards")
+    parser.add_argument("--n", type=int, default=1000, help="Documents seeded per collection")
+    args = parser.parse_args()
+    os.environ["DATABASE"] = args.database  # Must be set before database.db is imported
+    os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+    sys.exit(0 if asyncio.run(run(args.n)) else 1)
@@ -0,0 +1,114 @@
+"""Remove duplicate retries from user_transactions so the idempotency index can be built
+
+Before idempotent create_transaction, game-server retries wrote one row per attempt.
+The unique (user_id, reference_id) index (database/indexes.py) cannot be created while
+such duplicates exist; ensure_indexes logs the failure and carries on without it. The
+collection's other indexes are built on their own and are not affected.
+
+- --dry-run lists every (user_id, reference_id) with more than one row
+- --apply keeps the earliest row of each group and deletes the later rows with the same
+  type and amount (true retries), then creates the index
+
+Rows that reuse a reference_id with a different type or amount are not retries; they are
+listed for manual review and left in place, so the unique index stays missing until they
+are resolved (e.g. by giving them a new reference_id).
+
+After --apply, rebuild the derived collections so totals drop the retries:
+    python .\\scripts\\rebuild_user_balances.py --apply
+    python .\\scripts\\rebuild_daily_rollups.py --apply
+
+Usage (PowerShell):
+    python .\\scripts\\dedupe_transactions.py --dry-run
+    python .\\scripts\\dedupe_transactions.py --apply
+
+Reads MONGODB_URL and DATABASE from env.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db import user_transaction_db
+from database.indexes import ensure_collection_indexes
+
+DUPLICATES_PIPELINE = [
+    {"$match": {"reference_id": {"$type": "string"}}},
+    {"$sort": {"created_at": 1, "_id": 1}},
+    {"$group": {"_id": {"user_id": "$user_id", "reference_id": "$reference_id"},
+                "rows": {"$push": {"_id": "$_id", "type": "$type", "amount": "$amount"}},
+                "count": {"$sum": 1}}},
+    {"$match": {"count": {"$gt": 1}}},
+]
+
+
+def split_group(group: dict) -> tuple:
+    """(kept row, retries to delete, conflicting rows to review) of one duplicate group"""
+    kept, *rest = group["rows"]
+    retries = [row for row in rest if row["type"] == kept["type"] and row["amount"] == kept["amount"]]
+    conflicts = [row for row in rest if row not in retries]
+    return kept, retries, conflicts
+
+
+def print_conflicts(group: dict, kept: dict, conflicts: list) -> None:
+    print(f"REVIEW user_id={group['_id']['user_id']} reference_id={group['_id']['reference_id']}: "
+          f"kept {kept['_id']} ({kept['type']} {kept['amount']}), differs: "
+          + ", ".join(f"{row['_id']} ({row['type']} {row['amount']})" for row in conflicts))
+
+
+async def dry_run():
+    print("Running dry-run: looking for duplicate (user_id, reference_id) rows")
+    groups = 0
+    extra_rows = 0
+    review_rows = 0
+    async for group in user_transaction_db.aggregate(DUPLICATES_PIPELINE, allowDiskUse=True):
+        groups += 1
+        kept, retries, conflicts = split_group(group)
+        extra_rows += len(retries)
+        review_rows += len(conflicts)
+        print(f"user_id={group['_id']['user_id']} reference_id={group['_id']['reference_id']}: "
+              f"{group['count']} rows, {len(retries)} retries of {kept['type']} {kept['amount']}")
+        if conflicts:
+            print_conflicts(group, kept, conflicts)
+    print(f"Scan complete. Duplicate groups: {groups}, rows to delete: {extra_rows}, rows to review: {review_rows}")
+
+
+async def apply_changes():
+    print("Deleting duplicate retries (keeping the earliest row of each group)")
+    deleted = 0
+    review_rows = 0
+    async for group in user_transaction_db.aggregate(DUPLICATES_PIPELINE, allowDiskUse=True):
+        kept, retries, conflicts = split_group(group)
+        if retries:
+            result = await user_transaction_db.delete_many({"_id": {"$in": [row["_id"] for row in retries]}})
+            deleted += result.deleted_count
+        if conflicts:
+            review_rows += len(conflicts)
+            print_conflicts(group, kept, conflicts)
+    print(f"Deleted {deleted} row(s), left {review_rows} row(s) for review")
+    if deleted:
+        print("Balances and daily rollups still count the deleted rows; rebuild them now:")
+        print("    python .\\scripts\\rebuild_user_balances.py --apply")
+        print("    python .\\scripts\\rebuild_daily_rollups.py --apply")
+    if review_rows:
+        print("Unique index not built: resolve the rows marked REVIEW, then run --apply again")
+        return
+    names = await ensure_collection_indexes("user_transactions")
+    print(f"Indexes in place: {names}")
+    if "user_id_reference_id_unique" not in names:
+        print("Unique index still failed (see log); run --dry-run to look for new duplicates")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apply", action="store_true", help="Delete duplicates and build the index")
+    parser.add_argument("--dry-run", action="store_true", help="Report duplicates, don't write")
+    args = parser.parse_args()
+    if not args.apply and not args.dry_run:
+        parser.print_help()
+    else:
+        if args.dry_run:
+            asyncio.run(dry_run())
+        if args.apply:
+            asyncio.run(apply_changes())
@@ -0,0 +1,63 @@
+"""Check or apply the index registry in database/indexes.py
+
+- --dry-run reports missing, mismatched and redundant indexes per collection
+- --apply creates the missing ones (the app also does this on startup)
+
+Redundant indexes are only reported, never dropped; drop them by hand after review.
+
+Usage (PowerShell):
+    python .\\scripts\\ensure_indexes.py --dry-run
+    python .\\scripts\\ensure_indexes.py --apply
+
+Reads MONGODB_URL and DATABASE from env.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.indexes import diff_indexes, ensure_indexes, failed_indexes
+
+
+async def dry_run() -> bool:
+    print("Running dry-run: comparing index registry with the database")
+    report = await diff_indexes()
+    clean = True
+    for collection_name, diff in report.items():
+        problems = [(kind, item) for kind, items in diff.items() for item in items]
+        if not problems:
+            print(f"{collection_name}: ok")
+            continue
+        clean = False
+        print(f"{collection_name}:")
+        for kind, item in problems:
+            print(f"  {kind}: {item}")
+    print("Scan complete." + ("" if clean else " Run with --apply to create missing indexes."))
+    return clean
+
+
+async def apply_changes():
+    print("Applying index registry")
+    results = await ensure_indexes()
+    for collection_name, names in results.items():
+        failed = failed_indexes(collection_name, names)
+        print(f"{collection_name}: {', '.join(names) or '-'}"
+              + (f"  FAILED: {', '.join(failed)} (see log)" if failed else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apply", action="store_true", help="Create missing indexes")
+    parser.add_argument("--dry-run", action="store_true", help="Report missing/redundant indexes, don't write")
+    args = parser.parse_args()
+    if not args.apply and not args.dry_run:
+        parser.print_help()
+    else:
+        if args.dry_run:
+            clean = asyncio.run(dry_run())
+            if not args.apply:
+                sys.exit(0 if clean else 1)
+        if args.apply:
+            asyncio.run(apply_changes())
@@ -0,0 +1,89 @@
+"""Load test: OTP verification stays collision-free and O(1) with many pending OTPs
+
+With only 9000 possible 4-digit OTPs, hundreds of thousands of pending signups
+are guaranteed to share OTP values. This script fills the store, then checks:
+- every (mobile_number, otp) pair verifies to its own data
+- no user can be verified with another user's OTP
+- per-lookup latency stays flat as the number of pending OTPs grows
+
+Usage (PowerShell):
+    python .\\scripts\\loadtest_otp_collisions.py --pending 500000
+    python .\\scripts\\loadtest_otp_collisions.py --backend mongo --pending 50000
+
+Exits non-zero if any cross-user verification succeeds.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.otp_store import create_otp_store
+
+SAMPLE_SIZE = 2000
+
+
+async def timed_consume(store, pairs) -> float:
+    """Mean microseconds per consume over the given (mobile_number, otp) pairs"""
+    start = time.perf_counter()
+    for mobile_number, otp in pairs:
+        await store.consume(mobile_number, otp)
+    return (time.perf_counter() - start) / max(len(pairs), 1) * 1e6
+
+
+async def run(backend: str, pending: int, concurrency: int):
+    store = create_otp_store(backend)
+    await store.ensure_indexes()
+    semaphore = asyncio.Semaphore(concurrency)
+    base = 6000000000 + random.randint(0, 10**8)
+    issued = {str(base + i): str(random.randint(1000, 9999)) for i in range(pending)}
+    mobiles = list(issued)
+
+    async def send(mobile_number: str):
+        async with semaphore:
+            await store.save(mobile_number, issued[mobile_number], {"name": mobile_number})
+
+    latency = []
+    checkpoints = sorted({min(pending, n) for n in (1000, 10000, 100000, pending)})
+    loaded = 0
+    for checkpoint in checkpoints:
+        await asyncio.gather(*(send(m) for m in mobiles[loaded:checkpoint]))
+        loaded = checkpoint
+        # Measure misses so the probe does not shrink the store
+        probe = [(m, "0000") for m in random.sample(mobiles[:loaded], min(SAMPLE_SIZE, loaded))]
+        latency.append((loaded, await timed_consume(store, probe)))
+
+    print(f"backend={backend} pending={pending} distinct OTP values: {len(set(issued.values()))}")
+    for loaded, micros in latency:
+        print(f"  pending={loaded:>9,}  consume={micros:8.2f} us/op")
+
+    # Cross-user attempts: mobile A with B's OTP must fail whenever the OTPs differ
+    cross_hits = 0
+    for _ in range(min(SAMPLE_SIZE, pending)):
+        a, b = random.sample(mobiles, 2)
+        if issued[a] != issued[b] and await store.consume(a, issued[b]) is not None:
+            cross_hits += 1
+
+    async def verify(mobile_number: str) -> bool:
+        async with semaphore:
+            info = await store.consume(mobile_number, issued[mobile_number])
+            return info is not None and info["name"] == mobile_number
+
+    results = await asyncio.gather(*(verify(m) for m in mobiles))
+    wrong = results.count(False)
+    print(f"cross-user verifications accepted: {cross_hits}")
+    print(f"own-OTP verifications failed or mismatched: {wrong}")
+    return cross_hits == 0 and wrong == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["memory", "mongo"], default="memory")
+    parser.add_argument("--pending", type=int, default=200000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    ok = asyncio.run(run(args.backend, args.pending, args.concurrency))
+    sys.exit(0 if ok else 1)
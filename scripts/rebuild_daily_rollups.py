@@ -0,0 +1,71 @@
+"""Backfill / rebuild daily_txn_rollups from user_transactions and users
+
+Closed days (before today, IST) are recomputed from raw data and stored as finalized
+rollups, exactly as the background compactor does. Today is left to the incremental
+updates. Run --apply once after deploying the rollups so historic months are covered,
+and again after the switch to IST day boundaries: it re-keys every closed day to IST
+midnight and deletes the old UTC-midnight documents.
+
+Usage (PowerShell):
+    python .\\scripts\\rebuild_daily_rollups.py --dry-run
+    python .\\scripts\\rebuild_daily_rollups.py --apply --since 2025-01-01
+
+Reads MONGODB_URL and DATABASE from env.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db import daily_rollup_db
+from services.rollup_service import compute_daily, day_floor, finalize_days
+from utils.fanout import NO_TIMEOUT
+from utils.query_builder import IST, to_ist
+
+EPOCH = datetime(2000, 1, 1, tzinfo=IST)
+
+
+async def dry_run(since: datetime):
+    since = day_floor(since)
+    print(f"Running dry-run: comparing rollups with raw data since {to_ist(since).date()}")
+    end = day_floor(datetime.utcnow())
+    computed = await compute_daily(since, end, timeout=NO_TIMEOUT, primary=True)
+    stored = {doc["_id"]: doc async for doc in daily_rollup_db.find({"_id": {"$gte": since, "$lt": end}})}
+    changed = 0
+    for day in sorted(set(computed) | set(stored)):
+        expected, current = computed.get(day), stored.get(day)
+        if current is None:
+            print(f"{to_ist(day).date()}: missing")
+        elif expected is None:
+            print(f"{to_ist(day).date()}: stale rollup with no raw data")
+        elif any(current.get(k) != expected[k] for k in ("totals", "transaction_count", "new_users")):
+            print(f"{to_ist(day).date()}: drifted")
+        else:
+            continue
+        changed += 1
+    print(f"Scan complete. Days with data: {len(computed)}, days to rewrite: {changed}")
+
+
+async def apply_changes(since: datetime):
+    print(f"Rebuilding daily rollups since {since.date()} (IST)")
+    days = await finalize_days(since, day_floor(datetime.utcnow()))
+    print(f"Rebuild complete. Finalized days: {days}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apply", action="store_true", help="Rebuild closed days")
+    parser.add_argument("--dry-run", action="store_true", help="Show days that would change, don't write")
+    parser.add_argument("--since", type=lambda value: datetime.fromisoformat(value).replace(tzinfo=IST), default=EPOCH,
+                        help="First IST day to rebuild (YYYY-MM-DD)")
+    args = parser.parse_args()
+    if not args.apply and not args.dry_run:
+        parser.print_help()
+    else:
+        if args.dry_run:
+            asyncio.run(dry_run(args.since))
+        if args.apply:
+            asyncio.run(apply_changes(args.since))
@@ -0,0 +1,68 @@
+"""Backfill / rebuild the user_balances ledger from user_transactions
+
+- --dry-run recomputes every user's totals and reports users whose ledger row is missing or drifted
+- --apply rebuilds the totals into a staging collection and renames it over user_balances;
+  transactions written during the rebuild are folded in and their users reconciled
+  afterwards (see ledger_service.rebuild_balances), so the API can keep taking writes
+
+Run --apply once after deploying the ledger, and any time the two collections may have
+diverged (e.g. a crash between the transaction insert and the balance $inc).
+
+Usage (PowerShell):
+    python .\\scripts\\rebuild_user_balances.py --dry-run
+    python .\\scripts\\rebuild_user_balances.py --apply
+
+Reads MONGODB_URL and DATABASE from env.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db import user_balance_db, user_transaction_db
+from services.ledger_service import LEDGER_FIELDS, rebuild_balances, rebuild_pipeline
+
+
+async def dry_run():
+    print("Running dry-run: recomputing balances from user_transactions")
+    pipeline = rebuild_pipeline()[:-1]  # Same computation without the $out stage
+    drifted = 0
+    scanned = 0
+    async for expected in user_transaction_db.aggregate(pipeline):
+        scanned += 1
+        current = await user_balance_db.find_one({"_id": expected["_id"]})
+        if current is None:
+            drifted += 1
+            print(f"user_id={expected['_id']}: missing from user_balances")
+            continue
+        diffs = {
+            field: (current.get(field, 0), expected[field])
+            for field in LEDGER_FIELDS
+            if abs(current.get(field, 0) - expected[field]) > 1e-6
+        }
+        if diffs:
+            drifted += 1
+            print(f"user_id={expected['_id']}: {diffs}")
+    print(f"Scan complete. Users scanned: {scanned}, missing or drifted: {drifted}")
+
+
+async def apply_changes():
+    print("Rebuilding user_balances from user_transactions")
+    count = await rebuild_balances()
+    print(f"Rebuild complete. Ledger rows: {count}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apply", action="store_true", help="Rebuild the ledger")
+    parser.add_argument("--dry-run", action="store_true", help="Report drift, don't write")
+    args = parser.parse_args()
+    if not args.apply and not args.dry_run:
+        parser.print_help()
+    else:
+        if args.dry_run:
+            asyncio.run(dry_run())
+        if args.apply:
+            asyncio.run(apply_changes())
@@ -1,7 +1,8 @@
 from fastapi import HTTPException
 from database.db import user_db
 from schemas.auth_schema import CreateUser, User, SendOTPRequest
-from utils.auth_util import hash_password
+from services.password_service import hash_password_async
+from services.rollup_service import record_new_user
 from database.db import user_db
 import random
 import phonenumbers
@@ -18,8 +19,9 @@ async def get_user_by_mobile(mobile_number:str):
 async def create_user(user:CreateUser):
     user_obj=User(**user.model_dump())
     user_dict=user_obj.model_dump(by_alias=True)
-    user_dict['password']=hash_password(user_dict['password'])
+    user_dict['password']=await hash_password_async(user_dict['password'])
     result = await user_db.insert_one(user_dict)
+    await record_new_user(user_dict['created_at'], user_dict['role'])
     created_user = await user_db.find_one({"_id": result.inserted_id})
     return created_user  # ✅ This returns dict from MongoDB
 
@@ -36,11 +38,11 @@ def generate_otp() -> str:
     """Generate a 4-digit random OTP"""
     return str(random.randint(1000, 9999))
 
-def send_otp(user:SendOTPRequest):
+async def send_otp(user:SendOTPRequest):
     # otp_store={}
     validate_mobile_number(user.mobile_number)
     otp=generate_otp()
-    otp_store[user.mobile_number] = {"otp": otp, "name": user.name}
+    await otp_store.save(user.mobile_number, otp, {"name": user.name})
     print(otp)
     return {
         "message": f"OTP sent to {user.mobile_number}",
@@ -0,0 +1,141 @@
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from database.db import analytics_transaction_db, analytics_user_db
+from services.rollup_service import add_totals, earnings_record, empty_totals, monthly_totals, range_totals
+from utils.fanout import Query, fanout, max_time_ms
+from utils.query_builder import MIN_YEAR, created_at_range, date_part, day_bounds, ist_now, to_ist, year_bounds
+
+# Everything the admin dashboard shows, read concurrently (utils.fanout) with the same
+# response shapes as all_wallet_data / todays_earnings / monthly_earnings /
+# monthly_user_growth / monthly_combined_data:
+# - transactions before today: daily_txn_rollups (rollup_service), all-time and per month
+# - today's transactions: one created_at-bounded aggregation, added to both
+# - signups: one $facet over users narrowed by created_at
+
+TXN_TYPES = ("wallet_topup", "game_fee", "winning", "withdrawal")
+MONTH_NAMES = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December"
+]
+
+
+def _type_totals_stage() -> dict:
+    return {"$group": {"_id": {"$toString": "$type"}, "total_amount": {"$sum": "$amount"}, "count": {"$sum": 1}}}
+
+
+def _in_range(start: datetime, end: datetime) -> dict:
+    return {"$and": [{"$gte": ["$created_at", start]}, {"$lt": ["$created_at", end]}]}
+
+
+def today_transactions(now: datetime) -> list:
+    today_start, today_end = day_bounds(now)
+    return [{"$match": created_at_range(today_start, today_end)}, _type_totals_stage()]
+
+
+def user_facets(year: int, now: datetime) -> list:
+    today_start, today_end = day_bounds(now)
+    year_start, year_end = year_bounds(year)
+    return [
+        # Only today's and the year's signups are needed; the created_at index narrows the input
+        {"$match": {"$or": [created_at_range(today_start, today_end), created_at_range(year_start, year_end)]}},
+        {"$facet": {
+            "today": [{"$match": {"$expr": _in_range(today_start, today_end)}}, {"$count": "count"}],
+            "monthly": [
+                {"$match": {"$expr": _in_range(year_start, year_end)}},
+                {"$group": {
+                    "_id": date_part("$month"),
+                    # monthly_user_growth counts non-admins, monthly_combined_data counts role "user"
+                    "non_admin": {"$sum": {"$cond": [{"$ne": [{"$ifNull": ["$role", "user"]}, "admin"]}, 1, 0]}},
+                    "user": {"$sum": {"$cond": [{"$eq": [{"$ifNull": ["$role", "user"]}, "user"]}, 1, 0]}},
+                }},
+            ],
+        }},
+    ]
+
+
+def _row_totals(rows: list) -> dict:
+    """Rollup-shaped totals (rollup_service.empty_totals) from _type_totals_stage rows"""
+    totals = empty_totals()
+    for row in rows:
+        if row["_id"] in TXN_TYPES:
+            totals[row["_id"]] = row["total_amount"]
+        totals["transaction_count"] += row["count"]
+    return totals
+
+
+def _wallet_totals(totals: dict) -> dict:
+    return {
+        "total_wallet_topup": totals["wallet_topup"],
+        "total_game_fee": totals["game_fee"],
+        "total_winning": totals["winning"],
+        "total_withdrawal": totals["withdrawal"],
+        "total_transactions": totals["transaction_count"],
+    }
+
+
+def _monthly_earnings(year: int, months: Dict[Tuple[int, int], dict]) -> dict:
+    data = [
+        {"year": year, "month": month, **earnings_record(totals), "month_name": MONTH_NAMES[month - 1]}
+        for (_, month), totals in sorted(months.items())
+        if totals["transaction_count"] > 0
+    ]
+    return {"year": year, "month": None, "data": data, "total_records": len(data)}
+
+
+async def _no_months() -> dict:
+    return {}
+
+
+async def dashboard(year: Optional[int] = None, now: Optional[datetime] = None) -> dict:
+    now = now or ist_now()
+    year = year or to_ist(now).year
+    today_start, _ = day_bounds(now)
+    year_start, year_end = year_bounds(year)
+    # Closed days come from rollups; today (still being written) is read once, raw, and added below
+    year_closed_end = min(year_end, today_start)
+    today_rows, all_time, months, user_result = await fanout(
+        Query(analytics_transaction_db.aggregate(today_transactions(now), maxTimeMS=max_time_ms()).to_list(length=None), name="transactions"),
+        Query(range_totals(year_bounds(MIN_YEAR)[0], today_start), name="all_time"),
+        Query(monthly_totals(year_start, year_closed_end) if year_start < year_closed_end else _no_months(), name="monthly"),
+        Query(analytics_user_db.aggregate(user_facets(year, now), maxTimeMS=max_time_ms()).to_list(length=1), name="users"),
+    )
+    users = user_result[0]
+    today = _row_totals(today_rows)
+    add_totals(all_time, today)
+    if year_start <= today_start < year_end:
+        today_ist = to_ist(today_start)
+        add_totals(months.setdefault((today_ist.year, today_ist.month), empty_totals()), today)
+
+    monthly_earnings = _monthly_earnings(year, months)
+    revenue = {record["month"]: record["wallet_topup"] for record in monthly_earnings["data"]}
+    signups = {row["_id"]: row for row in users["monthly"]}
+    growth = [
+        {"year": year, "month": month, "user_count": signups[month]["non_admin"], "month_name": MONTH_NAMES[month - 1]}
+        for month in sorted(signups) if signups[month]["non_admin"]
+    ]
+
+    return {
+        "all_wallet_data": _wallet_totals(all_time),
+        "todays_earnings": {
+            **_wallet_totals(today),
+            "users_added_today": users["today"][0]["count"] if users["today"] else 0,
+        },
+        "monthly_earnings": monthly_earnings,
+        "monthly_user_growth": {
+            "year": year,
+            "data": growth,
+            "total_users": sum(record["user_count"] for record in growth),
+        },
+        "monthly_combined_data": {
+            "year": year,
+            "data": [
+                {
+                    "month": MONTH_NAMES[month - 1][:3],
+                    "month_number": month,
+                    "users": signups[month]["user"] if month in signups else 0,
+                    "revenue": revenue.get(month, 0),
+                }
+                for month in range(1, 13)
+            ],
+        },
+    }
@@ -0,0 +1,99 @@
+from bson import ObjectId
+from datetime import datetime
+from fastapi import HTTPException
+from typing import AsyncIterator, List
+import csv
+import io
+import json
+import os
+import zlib
+from database.db import analytics_transaction_db, logger
+from utils.pagination import after_created_at_asc
+
+# Finance export of user_transactions. Rows are read in (created_at, _id) order through a
+# batched cursor (created_at_id index) and encoded one batch at a time, so memory is bounded
+# by EXPORT_BATCH_SIZE whatever the size of the range. An interrupted download is resumed
+# with the _id of the last complete row received (resume_filter).
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+EXPORT_COLUMNS = ("_id", "user_id", "type", "amount", "reference_id", "created_at")
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def _row(doc: dict) -> dict:
+    return {
+        "_id": str(doc["_id"]),
+        "user_id": str(doc["user_id"]) if doc.get("user_id") is not None else None,
+        "type": str(doc.get("type")),
+        "amount": doc.get("amount"),
+        "reference_id": doc.get("reference_id"),
+        "created_at": doc["created_at"].isoformat(),
+    }
+
+
+def _encode_csv(rows: List[dict], header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, lineterminator="\n")
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def _encode_ndjson(rows: List[dict]) -> str:
+    return "".join(json.dumps(row) + "\n" for row in rows)
+
+
+async def resume_filter(resume_after: str) -> dict:
+    """Filter for the rows after the transaction `resume_after` in export order"""
+    if not ObjectId.is_valid(resume_after):
+        raise HTTPException(status_code=400, detail="Invalid resume_after")
+    last = await analytics_transaction_db.find_one({"_id": ObjectId(resume_after)}, {"created_at": 1})
+    if not last:
+        raise HTTPException(status_code=400, detail="resume_after does not match a transaction")
+    return after_created_at_asc(last["created_at"], last["_id"])
+
+
+async def stream_transactions(match: dict, format: str = "csv", gzip: bool = False,
+                              header: bool = True) -> AsyncIterator[bytes]:
+    """Encoded export chunks, one per batch of EXPORT_BATCH_SIZE rows.
+
+    With gzip every chunk ends in a sync flush, so the complete rows of a truncated
+    download can still be decompressed and the export resumed after the last one.
+    """
+    compressor = zlib.compressobj(wbits=31) if gzip else None  # wbits=31: gzip container
+
+    def encode(text: str) -> bytes:
+        data = text.encode()
+        if compressor is None:
+            return data
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def encode_rows(rows: List[dict], with_header: bool = False) -> bytes:
+        if format == "csv":
+            return encode(_encode_csv(rows, with_header))
+        return encode(_encode_ndjson(rows))
+
+    cursor = analytics_transaction_db.find(match).sort([("created_at", 1), ("_id", 1)]).batch_size(EXPORT_BATCH_SIZE)
+    exported = 0
+    rows = []
+    first = header and format == "csv"
+    try:
+        async for doc in cursor:
+            rows.append(_row(doc))
+            if len(rows) >= EXPORT_BATCH_SIZE:
+                yield encode_rows(rows, first)
+                exported += len(rows)
+                rows, first = [], False
+        if rows or first:
+            yield encode_rows(rows, first)
+            exported += len(rows)
+        if compressor is not None:
+            yield compressor.flush()
+    except Exception as e:
+        # Headers are already sent: the client sees a truncated body and resumes
+        logger.error(f"❌ Transaction export failed after {exported} rows: {e}")
+        raise
+    finally:
+        await cursor.close()
+    logger.info(f"✅ Transaction export finished: {exported} rows")
@@ -0,0 +1,186 @@
+from datetime import datetime, timedelta
+import os
+from database.db import user_balance_db, user_transaction_db
+
+# user_transactions.type -> running total field in user_balances
+BALANCE_FIELDS = {
+    "wallet_topup": "total_credit",
+    "game_fee": "total_game_fee",
+    "winning": "total_winning",
+    "withdrawal": "total_withdrawal",
+}
+# Sign of each type in net_balance = (credit + winning) - (withdrawal + game_fee)
+NET_SIGN = {"wallet_topup": 1, "winning": 1, "game_fee": -1, "withdrawal": -1}
+# Every numeric field of a user_balances row
+LEDGER_FIELDS = [*BALANCE_FIELDS.values(), "net_balance", "transaction_count"]
+
+# Balances are rebuilt into this collection and renamed over user_balances when complete
+REBUILD_STAGING_COLLECTION = "user_balances_rebuild"
+# Transactions newer than this may still be in flight (inserted, $inc not yet applied) when
+# a rebuild starts; they are folded in after the bulk pass instead of by it
+REBUILD_SETTLE_SECONDS = int(os.getenv("REBUILD_SETTLE_SECONDS", 60))
+
+EMPTY_BALANCE = {
+    "total_credit": 0,
+    "total_game_fee": 0,
+    "total_winning": 0,
+    "total_withdrawal": 0,
+    "net_balance": 0,
+    "transaction_count": 0,
+}
+
+
+def balance_key(user_id) -> str:
+    """user_balances is keyed by the string form of the user id (users._id is a str or ObjectId)"""
+    return str(user_id)
+
+
+async def apply_transaction(user_id, txn_type: str, amount: float) -> None:
+    """Fold one inserted transaction into the user's running totals"""
+    await user_balance_db.update_one(
+        {"_id": balance_key(user_id)},
+        {
+            "$inc": {
+                BALANCE_FIELDS[txn_type]: amount,
+                "net_balance": NET_SIGN[txn_type] * amount,
+                "transaction_count": 1,
+            },
+            "$set": {"updated_at": datetime.utcnow()},
+        },
+        upsert=True,
+    )
+
+
+async def apply_transactions(user_id, txn_docs: list) -> None:
+    """Fold a batch of one user's inserted transactions into their totals with a single $inc"""
+    if not txn_docs:
+        return
+    inc = {"transaction_count": len(txn_docs), "net_balance": 0}
+    for doc in txn_docs:
+        field = BALANCE_FIELDS[doc["type"]]
+        inc[field] = inc.get(field, 0) + doc["amount"]
+        inc["net_balance"] += NET_SIGN[doc["type"]] * doc["amount"]
+    await user_balance_db.update_one(
+        {"_id": balance_key(user_id)},
+        {"$inc": inc, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+def _sum_type(txn_type: str) -> dict:
+    return {"$sum": {"$cond": [{"$eq": [{"$toString": "$type"}, txn_type]}, "$amount", 0]}}
+
+
+def rebuild_pipeline(output: str = REBUILD_STAGING_COLLECTION, match: dict = None) -> list:
+    """Recompute the totals of every user (or of the transactions matching match) into output"""
+    return ([{"$match": match}] if match else []) + [
+        {
+            "$group": {
+                "_id": {"$toString": "$user_id"},
+                **{field: _sum_type(txn_type) for txn_type, field in BALANCE_FIELDS.items()},
+                "transaction_count": {"$sum": 1},
+            }
+        },
+        {
+            "$addFields": {
+                "net_balance": {
+                    "$subtract": [
+                        {"$add": ["$total_credit", "$total_winning"]},
+                        {"$add": ["$total_withdrawal", "$total_game_fee"]},
+                    ]
+                },
+                "updated_at": "$$NOW",
+            }
+        },
+        {"$out": output},
+    ]
+
+
+async def reconcile_balances(match: dict) -> int:
+    """Recompute the users with a transaction matching match and fix any drifted ledger row.
+
+    A fix only applies if the row's transaction_count is unchanged since it was read, so a
+    concurrent $inc is never overwritten. Returns the number of rows fixed.
+    """
+    fixed = 0
+    for user_id in await user_transaction_db.distinct("user_id", match):
+        current = await user_balance_db.find_one({"_id": balance_key(user_id)})
+        rows = await user_transaction_db.aggregate(rebuild_pipeline(match={"user_id": user_id})[:-1]).to_list(length=None)
+        if not rows:
+            continue
+        expected = {field: rows[0][field] for field in LEDGER_FIELDS}
+        if current is not None and all(abs(current.get(field, 0) - value) <= 1e-6 for field, value in expected.items()):
+            continue
+        if current is None:
+            result = await user_balance_db.update_one(
+                {"_id": balance_key(user_id)},
+                {"$setOnInsert": {**expected, "updated_at": datetime.utcnow()}},
+                upsert=True,
+            )
+            fixed += 1 if result.upserted_id is not None else 0
+        else:
+            result = await user_balance_db.update_one(
+                {"_id": balance_key(user_id), "transaction_count": current.get("transaction_count", 0)},
+                {"$set": {**expected, "updated_at": datetime.utcnow()}},
+            )
+            fixed += result.modified_count
+    return fixed
+
+
+async def rebuild_balances(settle_seconds: int = REBUILD_SETTLE_SECONDS) -> int:
+    """Rebuild user_balances from user_transactions while transactions keep being written.
+
+    1. Totals of everything older than the cutoff go into a staging collection ($out)
+    2. Transactions created since the cutoff are folded into staging with $inc
+    3. Staging is renamed over user_balances (dropTarget)
+    4. Users with a transaction since the cutoff are reconciled: their $inc may have
+       landed on the old collection between step 2 and the rename
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settle_seconds)
+    settled = {"created_at": {"$not": {"$gte": cutoff}}}  # Also rows without created_at
+    recent = {"created_at": {"$gte": cutoff}}
+    await user_transaction_db.aggregate(rebuild_pipeline(REBUILD_STAGING_COLLECTION, settled)).to_list(length=None)
+
+    staging = user_balance_db.database[REBUILD_STAGING_COLLECTION]
+    async for row in user_transaction_db.aggregate(rebuild_pipeline(match=recent)[:-1]):
+        await staging.update_one(
+            {"_id": row["_id"]},
+            {
+                "$inc": {field: row[field] for field in LEDGER_FIELDS},
+                "$set": {"updated_at": datetime.utcnow()},
+            },
+            upsert=True,
+        )
+
+    await staging.rename(user_balance_db.name, dropTarget=True)
+    await reconcile_balances(recent)
+    return await user_balance_db.count_documents({})
+
+
+def _summary(totals: dict, count: int) -> dict:
+    """Summary shape returned by the admin per-user transaction endpoint"""
+    return {
+        "total_wallet_topup": totals.get("total_credit", 0),
+        "total_game_fee": totals.get("total_game_fee", 0),
+        "total_winning": totals.get("total_winning", 0),
+        "total_withdrawal": totals.get("total_withdrawal", 0),
+        "net_balance": (totals.get("total_credit", 0) + totals.get("total_winning", 0))
+        - (totals.get("total_withdrawal", 0) + totals.get("total_game_fee", 0)),
+        "transaction_count": count,
+    }
+
+
+async def ledger_summary(user_id) -> dict:
+    """All-time totals for one user, read from user_balances (one _id lookup)"""
+    balance = await user_balance_db.find_one({"_id": balance_key(user_id)}) or {}
+    return _summary(balance, balance.get("transaction_count", 0))
+
+
+async def filtered_summary(match: dict) -> dict:
+    """Totals for an arbitrary transaction filter, computed by a single $group"""
+    rows = await user_transaction_db.aggregate([
+        {"$match": match},
+        {"$group": {"_id": {"$toString": "$type"}, "amount": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+    ]).to_list(length=None)
+    totals = {BALANCE_FIELDS[row["_id"]]: row["amount"] for row in rows if row["_id"] in BALANCE_FIELDS}
+    return _summary(totals, sum(row["count"] for row in rows))
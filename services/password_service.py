@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from functools import partial
+from utils.auth_util import hash_password, verify_password
+import asyncio
+import os
+
+# bcrypt releases the GIL, so a small thread pool keeps it off the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+# Requests allowed to wait for a worker before we shed load with 503
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 64))
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="pwd-hash")
+_in_flight = 0  # running + queued jobs; only touched from the event loop thread
+
+
+def _release() -> None:
+    global _in_flight
+    _in_flight -= 1
+
+
+def _release_from(loop: asyncio.AbstractEventLoop) -> None:
+    """Done-callback of a pool job; runs on the worker thread (or wherever the job was cancelled)"""
+    try:
+        loop.call_soon_threadsafe(_release)
+    except RuntimeError:
+        pass  # Loop already closed (shutdown)
+
+
+async def _run_in_pool(func, *args):
+    global _in_flight
+    if _in_flight >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    loop = asyncio.get_running_loop()
+    job = _executor.submit(func, *args)
+    _in_flight += 1
+    # Released when the job itself finishes (or is dropped from the queue), not when the caller
+    # stops waiting: a cancelled request's bcrypt call still occupies a worker until it returns
+    job.add_done_callback(lambda _: _release_from(loop))
+    return await asyncio.wrap_future(job)
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the bcrypt worker pool"""
+    return await _run_in_pool(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the bcrypt worker pool"""
+    return await _run_in_pool(verify_password, plain_password, hashed_password)
+
+
+def password_pool_stats() -> dict:
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "max_queue": PASSWORD_HASH_MAX_QUEUE,
+        "in_flight": _in_flight,
+    }
+
+
+async def shutdown_password_pool() -> None:
+    """Drop queued jobs and wait for running ones, off the event loop"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, partial(_executor.shutdown, wait=True, cancel_futures=True))
@@ -1,27 +1,52 @@
 from schemas.recharge_schema import RechargePackCreate, RechargePackUpdate
 from datetime import datetime
-from database.db import recharge_pack_db
-from typing import List
+from fastapi.encoders import jsonable_encoder
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from database.db import logger, recharge_pack_db
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import os
+
+# Catalog cache: the get-recharge-packs response, pre-serialized, per active_only flag.
+# Every pack mutation stamps a fresh catalog_version on the pack in the same write (one
+# round trip). Each worker polls a digest of all (_id, catalog_version) pairs, which moves
+# on any insert, update or delete, and drops its entries when it does, so changes made on
+# any worker show up within PACK_CATALOG_POLL_SECONDS (immediately on the worker that
+# made them).
+PACK_CATALOG_POLL_SECONDS = float(os.getenv("PACK_CATALOG_POLL_SECONDS", 5))
+
+_catalog: Dict[bool, Tuple[int, bytes, str]] = {}  # active_only -> (version, body, etag)
+_catalog_version = 0  # Local generation: bumped on local writes and on digest changes
+_catalog_digest: Optional[str] = None
+_PACK_PROJECTION = {"catalog_version": 0}  # Cache bookkeeping, never part of a pack response
+_catalog_stats = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
 
 async def create_pack(pack: RechargePackCreate) -> dict:
         """Create a new recharge pack"""
-        # Check if pack_id already exists
-        existing = await recharge_pack_db.find_one({"pack_id": pack.pack_id})
-        if existing:
-            raise ValueError(f"Pack with pack_id '{pack.pack_id}' already exists")
         pack_dict = pack.dict()
         pack_dict["is_active"] = True
         pack_dict["created_at"] = datetime.utcnow()
         pack_dict["updated_at"] = datetime.utcnow()
-        result = await recharge_pack_db.insert_one(pack_dict)
+        pack_dict["catalog_version"] = ObjectId()
+        try:
+            # pack_id_unique (database/indexes.py) rejects duplicates, no pre-read needed
+            result = await recharge_pack_db.insert_one(pack_dict)
+        except DuplicateKeyError:
+            raise ValueError(f"Pack with pack_id '{pack.pack_id}' already exists")
         pack_dict["_id"] = str(result.inserted_id)
+        pack_dict.pop("catalog_version")
+        invalidate_catalog()
         
         return pack_dict
 
 async def get_all_packs(active_only: bool = False) -> List[dict]:
         """Get all recharge packs"""
         query = {"is_active": True} if active_only else {}
-        cursor = recharge_pack_db.find(query).sort("display_order", 1)
+        cursor = recharge_pack_db.find(query, _PACK_PROJECTION).sort("display_order", 1)
         
         packs = []
         async for document in cursor:
@@ -31,7 +56,7 @@ async def get_all_packs(active_only: bool = False) -> List[dict]:
     
 async def get_pack_by_id(pack_id: str) -> dict:
         """Get a specific pack by pack_id"""        
-        pack = await recharge_pack_db.find_one({"pack_id": pack_id})
+        pack = await recharge_pack_db.find_one({"pack_id": pack_id}, _PACK_PROJECTION)
         if pack:
             pack["_id"] = str(pack["_id"])
             return pack
@@ -39,22 +64,23 @@ async def get_pack_by_id(pack_id: str) -> dict:
     
 async def update_pack(pack_id: str, pack_update: RechargePackUpdate) -> dict:
         """Update a recharge pack"""
-        # Get current pack
-        existing_pack = await recharge_pack_db.find_one({"pack_id": pack_id})
-        if not existing_pack:
-            raise ValueError(f"Pack with pack_id '{pack_id}' not found")
-        
         # Update only provided fields
         update_data = {k: v for k, v in pack_update.dict().items() if v is not None}
         update_data["updated_at"] = datetime.utcnow()
+        update_data["catalog_version"] = ObjectId()
         
-        await recharge_pack_db.update_one(
+        # One atomic command: apply the update and return the pack as it is afterwards
+        updated_pack = await recharge_pack_db.find_one_and_update(
             {"pack_id": pack_id},
-            {"$set": update_data}
+            {"$set": update_data},
+            projection=_PACK_PROJECTION,
+            return_document=ReturnDocument.AFTER
         )
+        if not updated_pack:
+            raise ValueError(f"Pack with pack_id '{pack_id}' not found")
         
-        # Return updated pack
-        updated_pack = await recharge_pack_db.find_one({"pack_id": pack_id})
+        invalidate_catalog()
+
         updated_pack["_id"] = str(updated_pack["_id"])
         
         return updated_pack
@@ -63,12 +89,113 @@ async def delete_pack(pack_id: str) -> bool:
         """Soft delete a pack (set is_active to False)"""
         result = await recharge_pack_db.update_one(
             {"pack_id": pack_id},
-            {"$set": {"is_active": False, "updated_at": datetime.utcnow()}}
+            {"$set": {"is_active": False, "updated_at": datetime.utcnow(), "catalog_version": ObjectId()}}
         )
+        if result.modified_count > 0:
+            invalidate_catalog()
         return result.modified_count > 0
     
 
 async def hard_delete_pack(pack_id: str) -> bool:
         """Permanently delete a pack"""
         result = await recharge_pack_db.delete_one({"pack_id": pack_id})
-        return result.deleted_count > 0
\ No newline at end of file
+        if result.deleted_count > 0:
+            invalidate_catalog()
+        return result.deleted_count > 0
+
+
+# ---------------- Catalog cache ---------------- #
+def _serialize(content: dict) -> bytes:
+    # Same encoding as FastAPI's JSONResponse, so cached and uncached bodies are identical
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def cached_catalog_etag(active_only: bool) -> Optional[str]:
+    """ETag of the current cached catalog, without touching Mongo (None if not cached)"""
+    entry = _catalog.get(active_only)
+    if entry is not None and entry[0] == _catalog_version:
+        return entry[2]
+    return None
+
+
+def record_not_modified() -> None:
+    _catalog_stats["not_modified"] += 1
+
+
+async def get_catalog(active_only: bool = True) -> Tuple[bytes, str]:
+    """(JSON body, ETag) of the get-recharge-packs response, served from memory when current"""
+    entry = _catalog.get(active_only)
+    if entry is not None and entry[0] == _catalog_version:
+        _catalog_stats["hits"] += 1
+        return entry[1], entry[2]
+    _catalog_stats["misses"] += 1
+    version = _catalog_version  # Read before the scan: a bump during it leaves this entry stale, not wrong
+    packs = await get_all_packs(active_only=active_only)
+    body = _serialize({"success": True, "data": packs, "count": len(packs)})
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'  # Content hash, so every worker agrees
+    _catalog[active_only] = (version, body, etag)
+    return body, etag
+
+
+def _bump_catalog_version() -> None:
+    global _catalog_version
+    _catalog_version += 1
+    _catalog.clear()
+    _catalog_stats["invalidations"] += 1
+
+
+def invalidate_catalog() -> None:
+    """Drop this worker's entries after a pack mutation (others see it on their next poll)"""
+    _bump_catalog_version()
+
+
+async def poll_catalog_version() -> None:
+    global _catalog_digest
+    docs = await recharge_pack_db.find({}, {"catalog_version": 1}).to_list(length=None)
+    digest = hashlib.sha1(
+        ",".join(sorted(f"{doc['_id']}:{doc.get('catalog_version')}" for doc in docs)).encode("utf-8")
+    ).hexdigest()
+    if digest != _catalog_digest:
+        if _catalog_digest is not None:
+            _bump_catalog_version()
+        _catalog_digest = digest
+
+
+def catalog_stats() -> dict:
+    lookups = _catalog_stats["hits"] + _catalog_stats["misses"]
+    return {
+        **_catalog_stats,
+        "version": _catalog_version,
+        "cached": sorted(_catalog),
+        "poll_seconds": PACK_CATALOG_POLL_SECONDS,
+        "hit_ratio": round(_catalog_stats["hits"] / lookups, 4) if lookups else 0.0,
+    }
+
+
+async def _catalog_poll_loop():
+    while True:
+        try:
+            await poll_catalog_version()
+        except Exception as e:
+            logger.error(f"❌ Pack catalog version poll failed: {str(e)}")
+        await asyncio.sleep(PACK_CATALOG_POLL_SECONDS)
+
+
+_poll_task: Optional[asyncio.Task] = None
+
+
+def start_catalog_poller() -> None:
+    global _poll_task
+    if _poll_task is None:
+        _poll_task = asyncio.create_task(_catalog_poll_loop())
+
+
+async def stop_catalog_poller() -> None:
+    global _poll_task
+    if _poll_task is not None:
+        _poll_task.cancel()
+        try:
+            await _poll_task
+        except asyncio.CancelledError:
+            pass
+        _poll_task = None
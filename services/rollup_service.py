@@ -0,0 +1,339 @@
+from datetime import datetime, timedelta
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import os
+from database.db import analytics_rollup_db, analytics_transaction_db, analytics_user_db, daily_rollup_db, logger, user_db, user_transaction_db
+from utils.fanout import NO_TIMEOUT, Query, fanout
+from utils.hll import HyperLogLog, register_for
+from utils.query_builder import IST, bucket, to_ist, to_utc_naive
+
+# daily_txn_rollups: one document per IST day, _id = IST midnight of that day as a naive UTC
+# datetime (18:30 the previous day), which is what $dateTrunc with timezone returns
+# {
+#   "_id": datetime, "totals": {type: amount}, "counts": {type: n}, "transaction_count": n,
+#   "new_users": {role: n}, "finalized": bool, "updated_at": datetime,
+#   "hll_sparse": {"<register>": rank},  # live days: distinct transacting users, $max per register
+#   "hll": bytes                          # finalized days: the same sketch packed (utils/hll.py)
+# }
+# Inserts $inc the current day's doc; the compactor later recomputes closed days from
+# raw data and marks them finalized. Analytics read closed days from here and only
+# aggregate raw data for the partial edges of a range (normally just today).
+
+TXN_TYPES = ("wallet_topup", "game_fee", "winning", "withdrawal")
+
+ROLLUP_COMPACT_INTERVAL_SECONDS = int(os.getenv("ROLLUP_COMPACT_INTERVAL_SECONDS", 600))
+# A closed day is only finalized once late $inc's for it can no longer be in flight
+ROLLUP_FINALIZE_GRACE_SECONDS = int(os.getenv("ROLLUP_FINALIZE_GRACE_SECONDS", 300))
+
+
+def day_floor(dt: datetime) -> datetime:
+    """Start of the IST day containing `dt`, as a rollup _id"""
+    dt = to_ist(dt)
+    return to_utc_naive(datetime(dt.year, dt.month, dt.day, tzinfo=IST))
+
+
+def day_ceil(dt: datetime) -> datetime:
+    floor = day_floor(dt)
+    return floor if floor == to_utc_naive(dt) else floor + timedelta(days=1)
+
+
+def empty_totals() -> dict:
+    return {**{t: 0 for t in TXN_TYPES}, "transaction_count": 0, "new_users": {}}
+
+
+def add_totals(into: dict, other: dict) -> dict:
+    for t in TXN_TYPES:
+        into[t] += other.get(t, 0)
+    into["transaction_count"] += other.get("transaction_count", 0)
+    for role, n in other.get("new_users", {}).items():
+        into["new_users"][role] = into["new_users"].get(role, 0) + n
+    return into
+
+
+def earnings_record(totals: dict) -> dict:
+    """The wallet_topup/game_fee/winning/withdrawal/net_earnings/transaction_count shape the endpoints return"""
+    return {
+        "wallet_topup": totals["wallet_topup"],
+        "game_fee": totals["game_fee"],
+        "winning": totals["winning"],
+        "withdrawal": totals["withdrawal"],
+        "net_earnings": (totals["wallet_topup"] + totals["game_fee"]) - (totals["winning"] + totals["withdrawal"]),
+        "transaction_count": totals["transaction_count"],
+    }
+
+
+def _doc_to_totals(doc: dict) -> dict:
+    totals = empty_totals()
+    for t in TXN_TYPES:
+        totals[t] = doc.get("totals", {}).get(t, 0)
+    totals["transaction_count"] = doc.get("transaction_count", 0)
+    totals["new_users"] = dict(doc.get("new_users", {}))
+    return totals
+
+
+# ---------------- Incremental updates ---------------- #
+async def record_transaction(created_at: datetime, txn_type: str, amount: float, user_id=None) -> None:
+    update = {
+        "$inc": {f"totals.{txn_type}": amount, f"counts.{txn_type}": 1, "transaction_count": 1},
+        "$set": {"updated_at": datetime.utcnow()},
+        "$setOnInsert": {"finalized": False},
+    }
+    if user_id is not None:
+        index, rank = register_for(user_id)
+        update["$max"] = {f"hll_sparse.{index}": rank}
+    await daily_rollup_db.update_one({"_id": day_floor(created_at)}, update, upsert=True)
+
+
+async def record_transactions(txn_docs: list) -> None:
+    """Batched record_transaction: one $inc (and $max of the HLL registers) per day touched by the batch"""
+    per_day = defaultdict(lambda: {"transaction_count": 0})
+    registers = defaultdict(dict)
+    for doc in txn_docs:
+        day = day_floor(doc["created_at"])
+        inc = per_day[day]
+        inc[f"totals.{doc['type']}"] = inc.get(f"totals.{doc['type']}", 0) + doc["amount"]
+        inc[f"counts.{doc['type']}"] = inc.get(f"counts.{doc['type']}", 0) + 1
+        inc["transaction_count"] += 1
+        index, rank = register_for(doc["user_id"])
+        field = f"hll_sparse.{index}"
+        registers[day][field] = max(rank, registers[day].get(field, 0))
+    for day, inc in per_day.items():
+        await daily_rollup_db.update_one(
+            {"_id": day},
+            {
+                "$inc": inc,
+                "$max": registers[day],
+                "$set": {"updated_at": datetime.utcnow()},
+                "$setOnInsert": {"finalized": False},
+            },
+            upsert=True,
+        )
+
+
+async def record_new_user(created_at: datetime, role) -> None:
+    role = getattr(role, "value", role) or "user"
+    await daily_rollup_db.update_one(
+        {"_id": day_floor(created_at)},
+        {
+            "$inc": {f"new_users.{role}": 1},
+            "$set": {"updated_at": datetime.utcnow()},
+            "$setOnInsert": {"finalized": False},
+        },
+        upsert=True,
+    )
+
+
+# ---------------- Raw aggregation ---------------- #
+async def compute_daily(start: datetime, end: datetime, timeout: Optional[float] = None,
+                        primary: bool = False) -> Dict[datetime, dict]:
+    """Per-day totals straight from user_transactions/users for start <= created_at < end.
+
+    Request-time reads go to the analytics handles (secondaries); the compactor reads the primary.
+    """
+    transactions, users = (user_transaction_db, user_db) if primary else (analytics_transaction_db, analytics_user_db)
+    match = {"created_at": {"$gte": start, "$lt": end}}
+    day = bucket("day")
+    txn_rows, user_rows = await fanout(
+        Query(transactions.aggregate([
+            {"$match": match},
+            {"$group": {"_id": {"day": day, "type": {"$toString": "$type"}}, "amount": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+        ]).to_list(length=None), name="daily_transactions"),
+        Query(users.aggregate([
+            {"$match": match},
+            {"$group": {"_id": {"day": day, "role": {"$ifNull": [{"$toString": "$role"}, "user"]}}, "count": {"$sum": 1}}},
+        ]).to_list(length=None), name="daily_signups"),
+        timeout=timeout,
+    )
+
+    days = defaultdict(lambda: {"totals": {}, "counts": {}, "transaction_count": 0, "new_users": {}})
+    for row in txn_rows:
+        doc = days[row["_id"]["day"]]
+        doc["totals"][row["_id"]["type"]] = row["amount"]
+        doc["counts"][row["_id"]["type"]] = row["count"]
+        doc["transaction_count"] += row["count"]
+    for row in user_rows:
+        days[row["_id"]["day"]]["new_users"][row["_id"]["role"]] = row["count"]
+    return dict(days)
+
+
+async def compute_daily_hll(start: datetime, end: datetime) -> Dict[datetime, HyperLogLog]:
+    """Per-day distinct-user sketches from user_transactions, streamed (one (day, user) pair at a time)"""
+    sketches = defaultdict(HyperLogLog)
+    pipeline = [
+        {"$match": {"created_at": {"$gte": start, "$lt": end}}},
+        {"$group": {"_id": {"day": bucket("day"), "user_id": "$user_id"}}},
+    ]
+    async for row in user_transaction_db.aggregate(pipeline, allowDiskUse=True):
+        sketches[row["_id"]["day"]].add(row["_id"]["user_id"])
+    return dict(sketches)
+
+
+async def _raw_hll(start: datetime, end: datetime) -> HyperLogLog:
+    sketch = HyperLogLog()
+    pipeline = [{"$match": {"created_at": {"$gte": start, "$lt": end}}}, {"$group": {"_id": "$user_id"}}]
+    async for row in analytics_transaction_db.aggregate(pipeline, allowDiskUse=True):
+        sketch.add(row["_id"])
+    return sketch
+
+
+async def _raw_totals(start: datetime, end: datetime) -> dict:
+    totals = empty_totals()
+    for doc in (await compute_daily(start, end)).values():
+        add_totals(totals, _doc_to_totals(doc))
+    return totals
+
+
+# ---------------- Reads ---------------- #
+Range = Tuple[datetime, datetime]
+
+
+def _split(start: datetime, end: datetime, now: Optional[datetime] = None) -> Tuple[Optional[Range], Optional[Range], Optional[Range]]:
+    """(raw head, whole closed days served by rollups, raw live tail) of [start, end)"""
+    start, end = to_utc_naive(start), to_utc_naive(end)
+    today = day_floor(now or datetime.utcnow())
+    first_full = day_ceil(start)
+    last_full_end = min(day_floor(end), today)
+    if first_full >= last_full_end:
+        return (start, end), None, None
+    head = (start, first_full) if start < first_full else None
+    tail = (last_full_end, end) if last_full_end < end else None
+    return head, (first_full, last_full_end), tail
+
+
+async def _none():
+    return None
+
+
+def _aligned(day: datetime) -> bool:
+    """Whether a rollup _id is an IST day start (older rollups were keyed by UTC midnight)"""
+    return day == day_floor(day)
+
+
+async def _rollups(full: Optional[Range], projection: dict):
+    if full is None:
+        return None
+    docs = await analytics_rollup_db.find({"_id": {"$gte": full[0], "$lt": full[1]}}, projection).sort("_id", 1).to_list(length=None)
+    # A misaligned doc overlaps two IST days already covered by aligned ones; compact_once replaces it
+    return [doc for doc in docs if _aligned(doc["_id"])]
+
+
+async def daily_totals(start: datetime, end: datetime, now: Optional[datetime] = None) -> List[Tuple[datetime, dict]]:
+    """(day, totals) for start <= t < end: whole closed days from rollups, partial days and today from raw data"""
+    head_range, full, tail_range = _split(start, end, now)
+    # Head, rollups and live tail (today's or a partial last day's transactions, served by
+    # the created_at index) are independent reads
+    head, rollups, tail = await fanout(
+        Query(_raw_totals(*head_range) if head_range else _none(), name="head"),
+        Query(_rollups(full, {"hll": 0, "hll_sparse": 0}), name="rollups"),
+        Query(_raw_totals(*tail_range) if tail_range else _none(), name="tail"),
+    )
+    segments = []
+    if head is not None:
+        segments.append((day_floor(head_range[0]), head))
+    segments.extend((doc["_id"], _doc_to_totals(doc)) for doc in rollups or [])
+    if tail is not None:
+        segments.append((tail_range[0], tail))
+    return segments
+
+
+async def distinct_users(start: datetime, end: datetime, now: Optional[datetime] = None) -> HyperLogLog:
+    """Sketch of the distinct users who transacted in [start, end): merged daily sketches plus raw edges.
+
+    Memory is one 4 KB sketch per day read, whatever the number of users (see utils/hll.py for the error bound).
+    """
+    head_range, full, tail_range = _split(start, end, now)
+    head, rollups, tail = await fanout(
+        Query(_raw_hll(*head_range) if head_range else _none(), name="head"),
+        Query(_rollups(full, {"hll": 1, "hll_sparse": 1}), name="rollups"),
+        Query(_raw_hll(*tail_range) if tail_range else _none(), name="tail"),
+    )
+    sketch = HyperLogLog()
+    for part in (head, tail):
+        if part is not None:
+            sketch.merge(part)
+    # A year is ~365 packed sketches: fold them in one pass (see HyperLogLog.merge_all)
+    sketch.merge_all(doc["hll"] for doc in rollups or [] if doc.get("hll"))
+    for doc in rollups or []:
+        if doc.get("hll_sparse"):
+            sketch.merge_sparse(doc["hll_sparse"])
+    return sketch
+
+
+async def range_totals(start: datetime, end: datetime) -> dict:
+    totals = empty_totals()
+    for _, day_totals in await daily_totals(start, end):
+        add_totals(totals, day_totals)
+    return totals
+
+
+async def monthly_totals(start: datetime, end: datetime) -> Dict[Tuple[int, int], dict]:
+    """{(year, month): totals} for the IST months touched by [start, end)"""
+    months = {}
+    for day, day_totals in await daily_totals(start, end):
+        day = to_ist(day)
+        add_totals(months.setdefault((day.year, day.month), empty_totals()), day_totals)
+    return months
+
+
+# ---------------- Compactor ---------------- #
+async def finalize_days(start: datetime, end: datetime) -> int:
+    """Recompute the IST days covering [start, end) from raw data and store them as finalized rollups"""
+    start, end = day_floor(start), day_ceil(end)  # Never store a partial day as finalized
+    computed = await compute_daily(start, end, timeout=NO_TIMEOUT, primary=True)  # Compactor and backfills, not a request
+    sketches = await compute_daily_hll(start, end)
+    now = datetime.utcnow()
+    for day, doc in computed.items():
+        if day in sketches:
+            doc["hll"] = sketches[day].to_bytes()
+        await daily_rollup_db.replace_one(
+            {"_id": day},
+            {**doc, "finalized": True, "updated_at": now},
+            upsert=True,
+        )
+    # Days in range with no activity left must not keep stale incremental counts
+    await daily_rollup_db.delete_many({"_id": {"$gte": start, "$lt": end, "$nin": list(computed)}})
+    return len(computed)
+
+
+async def compact_once() -> int:
+    cutoff = day_floor(datetime.utcnow() - timedelta(seconds=ROLLUP_FINALIZE_GRACE_SECONDS))
+    # Unfinalized days, plus documents keyed by another day boundary (pre-IST UTC midnights),
+    # finalized or not: finalizing the IST day they fall in deletes them
+    pending = sorted({day_floor(doc["_id"]) async for doc in daily_rollup_db.find(
+        {"_id": {"$lt": cutoff}}, {"_id": 1, "finalized": 1}
+    ) if not doc.get("finalized") or not _aligned(doc["_id"])})
+    for day in pending:
+        await finalize_days(day, day + timedelta(days=1))
+    return len(pending)
+
+
+async def _compactor_loop():
+    while True:
+        try:
+            finalized = await compact_once()
+            if finalized:
+                logger.info(f"✅ Finalized {finalized} daily rollup(s)")
+        except Exception as e:
+            logger.error(f"❌ Rollup compaction failed: {str(e)}")
+        await asyncio.sleep(ROLLUP_COMPACT_INTERVAL_SECONDS)
+
+
+_compactor_task: Optional[asyncio.Task] = None
+
+
+def start_rollup_compactor() -> None:
+    global _compactor_task
+    if _compactor_task is None:
+        _compactor_task = asyncio.create_task(_compactor_loop())
+
+
+async def stop_rollup_compactor() -> None:
+    global _compactor_task
+    if _compactor_task is not None:
+        _compactor_task.cancel()
+        try:
+            await _compactor_task
+        except asyncio.CancelledError:
+            pass
+        _compactor_task = None
@@ -0,0 +1,146 @@
+from collections import defaultdict
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from typing import List, Optional, Set, Tuple
+import asyncio
+import os
+import time
+from database.db import logger, user_transaction_db
+from services.ledger_service import apply_transactions
+from services.rollup_service import record_transactions
+from utils.metrics import Histogram
+
+# Concurrent create_transaction calls are coalesced into one insert_many. A batch is
+# flushed when it reaches TXN_WRITE_MAX_BATCH docs or its oldest doc has waited
+# TXN_WRITE_MAX_LINGER_MS, whichever comes first. Each caller still awaits its own id.
+TXN_WRITE_MAX_BATCH = int(os.getenv("TXN_WRITE_MAX_BATCH", 200))
+TXN_WRITE_MAX_LINGER_MS = float(os.getenv("TXN_WRITE_MAX_LINGER_MS", 5))
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 200, 500, 1000)
+LINGER_MS_BUCKETS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250)
+
+
+def _write_error(err: dict) -> Exception:
+    if err.get("code") == 11000:
+        return DuplicateKeyError(err.get("errmsg", "duplicate key"), 11000, err)
+    return BulkWriteError({"writeErrors": [err]})
+
+
+async def update_derived(inserted: List[dict]) -> int:
+    """Apply inserted transactions to user_balances (per user) and daily_txn_rollups.
+
+    The rows are already committed, so a failure here must not fail their callers: each
+    update is attempted on its own and logged; scripts/rebuild_user_balances.py and
+    scripts/rebuild_daily_rollups.py repair whatever was missed. Returns the failed count.
+    """
+    failures = 0
+    per_user = defaultdict(list)
+    for doc in inserted:
+        per_user[doc["user_id"]].append(doc)
+    for user_id, user_docs in per_user.items():
+        try:
+            await apply_transactions(user_id, user_docs)
+        except Exception as e:
+            failures += 1
+            logger.error(f"❌ Balance update for user {user_id} ({len(user_docs)} transactions) failed: {str(e)}")
+    if inserted:
+        try:
+            await record_transactions(inserted)
+        except Exception as e:
+            failures += 1
+            logger.error(f"❌ Rollup update for {len(inserted)} transactions failed: {str(e)}")
+    return failures
+
+
+class TransactionWriter:
+    def __init__(self, max_batch: int = TXN_WRITE_MAX_BATCH, max_linger_ms: float = TXN_WRITE_MAX_LINGER_MS):
+        self.max_batch = max(1, max_batch)
+        self.max_linger = max(0.0, max_linger_ms) / 1000
+        self._pending: List[Tuple[dict, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushing: Set[asyncio.Task] = set()
+        self._closed = False
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.linger_ms = Histogram(LINGER_MS_BUCKETS)
+        self.batches = 0
+        self.failed = 0
+        self.derived_failures = 0  # Balance/rollup updates that failed after a successful insert
+
+    async def submit(self, txn_doc: dict):
+        """Queue one transaction and return its inserted _id once its batch is written"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((txn_doc, future, time.perf_counter()))
+        if self._closed or len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_linger, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._write(batch))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _write(self, batch: List[Tuple[dict, asyncio.Future, float]]) -> None:
+        started = time.perf_counter()
+        self.batches += 1
+        self.batch_size.observe(len(batch))
+        for _, _, enqueued_at in batch:
+            self.linger_ms.observe((started - enqueued_at) * 1000)
+
+        docs = [doc for doc, _, _ in batch]
+        errors = {}
+        try:
+            # insert_many sets _id on every doc up front, so ids are known even on partial failure
+            await user_transaction_db.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errors = {err["index"]: err for err in e.details.get("writeErrors", [])}
+        except Exception as e:
+            logger.error(f"❌ Transaction batch of {len(batch)} failed: {str(e)}")
+            self.failed += len(batch)
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Callers' results depend on the insert alone; derived updates only log their failures
+        self.derived_failures += await update_derived(
+            [doc for index, doc in enumerate(docs) if index not in errors])
+
+        for index, (doc, future, _) in enumerate(batch):
+            if future.done():  # Caller went away; the row is written regardless
+                continue
+            if index in errors:
+                self.failed += 1
+                future.set_exception(_write_error(errors[index]))
+            else:
+                future.set_result(doc["_id"])
+
+    async def close(self) -> None:
+        """Stop lingering, write whatever is queued and wait for in-flight batches"""
+        self._closed = True
+        self._flush()
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch": self.max_batch,
+            "max_linger_ms": self.max_linger * 1000,
+            "pending": len(self._pending),
+            "in_flight_batches": len(self._flushing),
+            "batches": self.batches,
+            "failed": self.failed,
+            "derived_failures": self.derived_failures,
+            "batch_size": self.batch_size.snapshot(),
+            "linger_ms": self.linger_ms.snapshot(),
+        }
+
+
+txn_writer = TransactionWriter()
@@ -5,6 +5,7 @@ import hashlib, base64, jwt, os
 from datetime import datetime, timezone, timedelta
 from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
 from database.db import user_db
+from utils.user_cache import get_cached_user, set_cached_user
 
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecret")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
@@ -72,6 +73,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         )
     # return payload
     user_id = payload.get("sub")
+    user = get_cached_user(user_id)
+    if user is not None:
+        return user
+
     user = await user_db.find_one({"_id": user_id})
     
     if not user:
@@ -80,6 +85,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             detail="User not found"
         )
     
+    set_cached_user(user_id, user)
     return user  # ✅ Returns fresh data with updated email/password
 
 def admin_role(current_user: dict = Depends(get_current_user)):
@@ -0,0 +1,51 @@
+from fastapi import HTTPException, status
+from typing import Awaitable, NamedTuple, Optional, Union
+import asyncio
+import os
+
+# Default per-query budget for analytics fan-outs. Also passed to Mongo as maxTimeMS
+# (see max_time_ms) so a cancelled query stops on the server too, not just in the handler.
+ANALYTICS_QUERY_TIMEOUT_SECONDS = float(os.getenv("ANALYTICS_QUERY_TIMEOUT_SECONDS", 15))
+# For background jobs and backfills that may legitimately run for minutes
+NO_TIMEOUT = float("inf")
+
+
+class Query(NamedTuple):
+    awaitable: Awaitable
+    timeout: Optional[float] = None
+    name: str = "query"
+
+
+def max_time_ms(timeout: Optional[float] = None) -> int:
+    return int((timeout or ANALYTICS_QUERY_TIMEOUT_SECONDS) * 1000)
+
+
+async def fanout(*queries: Union[Awaitable, Query], timeout: Optional[float] = None) -> list:
+    """Run independent queries concurrently and return their results in argument order.
+
+    Each query gets its own timeout (Query.timeout, else `timeout`, else the default).
+    The first failure or timeout cancels the queries still running; a timeout becomes a 504.
+    """
+    default = timeout or ANALYTICS_QUERY_TIMEOUT_SECONDS
+    queries = [q if isinstance(q, Query) else Query(q) for q in queries]
+    budgets = [q.timeout or default for q in queries]
+    tasks = [
+        asyncio.ensure_future(q.awaitable if budget == NO_TIMEOUT else asyncio.wait_for(q.awaitable, budget))
+        for q, budget in zip(queries, budgets)
+    ]
+    try:
+        return await asyncio.gather(*tasks)
+    except asyncio.TimeoutError:
+        timed_out = [q.name for q, task in zip(queries, tasks) if task.done() and not task.cancelled()
+                     and isinstance(task.exception(), asyncio.TimeoutError)]
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Analytics query timed out: {', '.join(timed_out) or 'query'}",
+        )
+    finally:
+        # Failure, timeout or the request itself being cancelled: stop the rest
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        if any(not task.done() for task in tasks):
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,110 @@
+from hashlib import blake2b
+from typing import Dict, Iterable, Optional
+import math
+
+# HyperLogLog distinct counter. With HLL_PRECISION = 12 there are 4096 one-byte registers
+# (4 KB packed) and the relative standard error is 1.04 / sqrt(4096) ~= 1.6%, i.e. about
+# 95% of estimates land within +-3.3% of the true count. Sketches merge by register-wise
+# max, so per-day sketches combine into any range without revisiting raw data.
+
+HLL_PRECISION = 12
+HLL_REGISTERS = 1 << HLL_PRECISION
+HLL_STANDARD_ERROR = round(1.04 / math.sqrt(HLL_REGISTERS), 4)
+
+_RANK_BITS = 64 - HLL_PRECISION
+
+# merge() takes the register-wise max on all registers at once, as one big int with a byte
+# lane per register (SWAR): ranks are at most _RANK_BITS + 1 < 128, so setting each lane's
+# high bit and subtracting never borrows across lanes, and the high bit survives iff a >= b.
+_LANE_HIGH = int.from_bytes(b"\x80" * HLL_REGISTERS, "little")
+
+
+def register_for(value) -> tuple:
+    """(register index, rank) that `value` updates; rank = position of the first 1 bit"""
+    h = int.from_bytes(blake2b(str(value).encode(), digest_size=8).digest(), "big")
+    index = h >> _RANK_BITS
+    rest = h & ((1 << _RANK_BITS) - 1)
+    return index, _RANK_BITS - rest.bit_length() + 1
+
+
+class HyperLogLog:
+    def __init__(self, registers: Optional[bytes] = None):
+        self.registers = bytearray(registers) if registers else bytearray(HLL_REGISTERS)
+
+    def add(self, value) -> None:
+        index, rank = register_for(value)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable) -> "HyperLogLog":
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        return self.merge_all([other.registers])
+
+    def merge_all(self, registers: Iterable[bytes]) -> "HyperLogLog":
+        """Merge many packed sketches (to_bytes() form), converting to and from int only once"""
+        merged = int.from_bytes(self.registers, "little")
+        for other in registers:
+            merged = _lane_max(merged, int.from_bytes(other, "little"))
+        self.registers = bytearray(merged.to_bytes(HLL_REGISTERS, "little"))
+        return self
+
+    def merge_sparse(self, sparse: Dict[str, int]) -> "HyperLogLog":
+        """Merge the {"<index>": rank} form kept in live rollup documents"""
+        for index, rank in sparse.items():
+            index = int(index)
+            if rank > self.registers[index]:
+                self.registers[index] = rank
+        return self
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+    def count(self) -> int:
+        """Ertl's improved raw estimator: no small/large-range switch, so no bias bump near 2.5m"""
+        m, q = HLL_REGISTERS, _RANK_BITS
+        histogram = [0] * (q + 2)
+        for r in self.registers:
+            histogram[r] += 1
+        z = m * _tau(1 - histogram[q + 1] / m)
+        for k in range(q, 0, -1):
+            z = 0.5 * (z + histogram[k])
+        z += m * _sigma(histogram[0] / m)
+        if z == math.inf:
+            return 0
+        return int(round(m * m / (2 * math.log(2) * z)))
+
+
+def _lane_max(a: int, b: int) -> int:
+    a_wins = (((a | _LANE_HIGH) - b) & _LANE_HIGH) >> 7  # 1 in each lane where a >= b
+    a_wins *= 0xFF  # Lanes hold 0 or 1, so this cannot carry
+    return (a & a_wins) | (b & ~a_wins)
+
+
+def _sigma(x: float) -> float:
+    if x == 1:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x: float) -> float:
+    if x == 0 or x == 1:
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
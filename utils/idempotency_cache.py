@@ -0,0 +1,53 @@
+from cachetools import TTLCache
+from typing import Optional
+import os
+
+# Per-process cache of recently created transactions, keyed by (user id as string, reference_id).
+# Retries of a recent create_transaction are answered from here without touching Mongo;
+# the unique (user_id, reference_id) index is what actually guarantees a single write.
+IDEMPOTENCY_CACHE_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_CACHE_TTL_SECONDS", 600))
+IDEMPOTENCY_CACHE_MAXSIZE = int(os.getenv("IDEMPOTENCY_CACHE_MAXSIZE", 50000))
+
+_txn_cache = TTLCache(maxsize=IDEMPOTENCY_CACHE_MAXSIZE, ttl=IDEMPOTENCY_CACHE_TTL_SECONDS)
+_stats = {"hits": 0, "misses": 0, "db_duplicates": 0}
+
+
+def _key(user_id, reference_id: str) -> tuple:
+    return (str(user_id), reference_id)
+
+
+def get_cached_transaction(user_id, reference_id: Optional[str]) -> Optional[dict]:
+    """Return the cached TransactionResponse fields of an earlier request, or None"""
+    if reference_id is None:
+        return None
+    txn = _txn_cache.get(_key(user_id, reference_id))
+    if txn is None:
+        _stats["misses"] += 1
+        return None
+    _stats["hits"] += 1
+    return dict(txn)
+
+
+def remember_transaction(user_id, reference_id: Optional[str], txn: dict) -> None:
+    if reference_id is not None:
+        _txn_cache[_key(user_id, reference_id)] = dict(txn)
+
+
+def record_db_duplicate() -> None:
+    """A retry that missed the cache and was caught by the unique index instead"""
+    _stats["db_duplicates"] += 1
+
+
+def clear_idempotency_cache() -> None:
+    _txn_cache.clear()
+
+
+def idempotency_cache_stats() -> dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "size": len(_txn_cache),
+        "maxsize": IDEMPOTENCY_CACHE_MAXSIZE,
+        "ttl_seconds": IDEMPOTENCY_CACHE_TTL_SECONDS,
+        "hit_ratio": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+    }
@@ -0,0 +1,151 @@
+from collections import deque
+from typing import Optional
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from utils.metrics import Histogram
+
+# Event-loop health. A sampler task sleeps LOOP_LAG_SAMPLE_SECONDS at a time and records how
+# late it wakes up (scheduling delay = time some callback held the loop). When the
+# blocking-call detector is on, a watchdog thread also checks that wake-up from outside the
+# loop: once it is LOOP_BLOCKED_THRESHOLD_MS overdue, it captures the loop thread's current
+# stack and task, i.e. the code that is blocking right now (bcrypt, phonenumbers, print, ...).
+# Each stall is logged once, as JSON, when the loop resumes and its full duration is known.
+#
+# The detector only reads a float per check and walks frames on a stall, but it is meant for
+# debugging: on by default outside production, LOOP_BLOCKING_DETECTOR=true/false overrides.
+
+LOOP_LAG_SAMPLE_SECONDS = float(os.getenv("LOOP_LAG_SAMPLE_SECONDS", 0.1))
+LOOP_BLOCKED_THRESHOLD_MS = float(os.getenv("LOOP_BLOCKED_THRESHOLD_MS", 100))
+LOOP_BLOCKING_DETECTOR = os.getenv(
+    "LOOP_BLOCKING_DETECTOR", "false" if os.getenv("ENVIRONMENT", "development") == "production" else "true"
+).lower() == "true"
+
+LAG_SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+STACK_DEPTH = 20
+RECENT_BLOCKED = 20
+
+logger = logging.getLogger("event_loop")
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = LOOP_LAG_SAMPLE_SECONDS, threshold_ms: float = LOOP_BLOCKED_THRESHOLD_MS,
+                 detector: bool = LOOP_BLOCKING_DETECTOR):
+        self.interval = interval
+        self.threshold = threshold_ms / 1000
+        self.detector = detector
+        self.lag = Histogram(LAG_SECONDS_BUCKETS)
+        self.max_lag = 0.0
+        self.blocked = 0
+        self.blocked_reports = deque(maxlen=RECENT_BLOCKED)
+        self._expected_wake: Optional[float] = None  # time.monotonic() the sampler should wake at
+        self._captured: Optional[dict] = None  # Written by the watchdog, consumed by the sampler
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._watchdog_thread: Optional[threading.Thread] = None
+
+    # ---------------- Sampler (event loop) ---------------- #
+    async def _sample_loop(self) -> None:
+        while True:
+            self._expected_wake = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._expected_wake)
+            self._expected_wake = None
+            self.lag.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                self._report(lag)
+
+    def _report(self, lag: float) -> None:
+        captured, self._captured = self._captured, None
+        report = {"event": "event_loop_blocked", "at": time.time(), "blocked_ms": round(lag * 1000, 3)}
+        if captured:
+            report.update(captured)
+        self.blocked += 1
+        self.blocked_reports.append(report)
+        logger.warning(json.dumps(report, default=str))
+
+    # ---------------- Watchdog (own thread) ---------------- #
+    def _watchdog(self) -> None:
+        reported_wake = None
+        while not self._stop.wait(self.threshold / 2):
+            expected = self._expected_wake
+            if expected is None or expected == reported_wake:
+                continue
+            overdue = time.monotonic() - expected
+            if overdue >= self.threshold:
+                reported_wake = expected  # One capture per stall
+                self._captured = self._capture(overdue)
+
+    def _capture(self, overdue: float) -> dict:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.extract_stack(frame, limit=STACK_DEPTH) if frame is not None else []
+        try:
+            task = asyncio.current_task(self._loop)  # Read-only lookup, safe from another thread
+        except RuntimeError:
+            task = None
+        coroutine = task.get_coro() if task is not None else None
+        return {
+            # None: the loop is blocked in a plain callback, not inside a task
+            "task": task.get_name() if task is not None else None,
+            "coroutine": getattr(coroutine, "__qualname__", None),
+            "detected_after_ms": round(overdue * 1000, 3),
+            "stack": [f"{entry.filename}:{entry.lineno} in {entry.name}: {entry.line}" for entry in stack],
+        }
+
+    # ---------------- Lifecycle ---------------- #
+    def start(self) -> asyncio.Task:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        if self.detector:
+            self._stop.clear()
+            self._watchdog_thread = threading.Thread(target=self._watchdog, name="loop-watchdog", daemon=True)
+            self._watchdog_thread.start()
+        return asyncio.create_task(self._sample_loop())
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._watchdog_thread is not None:
+            self._watchdog_thread.join(timeout=1)
+            self._watchdog_thread = None
+        self._expected_wake = None
+
+    def stats(self) -> dict:
+        return {
+            "sample_seconds": self.interval,
+            "blocked_threshold_ms": self.threshold * 1000,
+            "blocking_detector": self.detector,
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "lag_seconds": self.lag.snapshot(),
+            "blocked": self.blocked,
+            "recent_blocked": list(self.blocked_reports),
+        }
+
+
+loop_monitor = LoopMonitor()
+
+_sampler_task: Optional[asyncio.Task] = None
+
+
+def start_loop_monitor() -> None:
+    global _sampler_task
+    if _sampler_task is None:
+        _sampler_task = loop_monitor.start()
+
+
+async def stop_loop_monitor() -> None:
+    global _sampler_task
+    loop_monitor.stop()
+    if _sampler_task is not None:
+        _sampler_task.cancel()
+        try:
+            await _sampler_task
+        except asyncio.CancelledError:
+            pass
+        _sampler_task = None
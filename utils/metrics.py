@@ -0,0 +1,79 @@
+from bisect import bisect_left
+from typing import Iterable, List, Sequence, Tuple
+
+
+class Histogram:
+    """Cumulative bucket counts, in the same shape a Prometheus histogram exposes"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def copy(self) -> "Histogram":
+        """Point-in-time copy, for rendering outside the lock that guards observe()"""
+        clone = Histogram(self.buckets)
+        clone.counts = list(self.counts)
+        clone.count = self.count
+        clone.sum = self.sum
+        return clone
+
+    def snapshot(self) -> dict:
+        cumulative, running = {}, 0
+        for bound, n in zip(list(self.buckets) + ["+Inf"], self.counts):
+            running += n
+            cumulative[str(bound)] = running
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else 0,
+            "buckets": cumulative,
+        }
+
+
+# ---------------- Prometheus text exposition (format 0.0.4) ---------------- #
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_counter(name: str, help_text: str, samples: Iterable[Tuple[dict, float]], kind: str = "counter") -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{_labels(labels)} {_number(value)}" for labels, value in samples)
+    return lines
+
+
+def render_gauge(name: str, help_text: str, samples: Iterable[Tuple[dict, float]]) -> List[str]:
+    return render_counter(name, help_text, samples, kind="gauge")
+
+
+def render_histogram(name: str, help_text: str, samples: Iterable[Tuple[dict, "Histogram"]], scale: float = 1.0) -> List[str]:
+    """`scale` converts the histogram's unit, e.g. 0.001 to export a millisecond histogram in seconds"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in samples:
+        running = 0
+        for bound, n in zip(histogram.buckets, histogram.counts):
+            running += n
+            lines.append(f"{name}_bucket{_labels({**labels, 'le': _number(float(bound) * scale)})} {running}")
+        lines.append(f"{name}_bucket{_labels({**labels, 'le': '+Inf'})} {histogram.count}")
+        lines.append(f"{name}_sum{_labels(labels)} {_number(histogram.sum * scale)}")
+        lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    return lines
@@ -1,3 +1,119 @@
-otp_store={}
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Optional
+import heapq
+import os
+import time
 
-otp_lookup={}
\ No newline at end of file
+OTP_TTL_SECONDS = int(os.getenv("OTP_TTL_SECONDS", 300))
+# "mongo" shares OTPs across uvicorn/gunicorn workers, "memory" is per-process (single worker / tests)
+OTP_STORE_BACKEND = os.getenv("OTP_STORE_BACKEND", "mongo").lower()
+
+
+class OTPStore(ABC):
+    """Pending OTPs addressed by (mobile_number, otp); one live OTP per mobile number"""
+
+    ttl_seconds: int
+
+    @abstractmethod
+    async def save(self, mobile_number: str, otp: str, data: dict) -> None:
+        """Store (or replace) the pending OTP for a mobile number"""
+
+    @abstractmethod
+    async def get(self, mobile_number: str) -> Optional[dict]:
+        """Return {"otp": ..., **data} for an unexpired OTP, else None"""
+
+    @abstractmethod
+    async def consume(self, mobile_number: str, otp: str) -> Optional[dict]:
+        """Atomically remove and return the OTP if (mobile_number, otp) matches and is unexpired"""
+
+    async def ensure_indexes(self) -> None:
+        pass
+
+
+class InMemoryOTPStore(OTPStore):
+    """Per-process store; expiry is driven by a min-heap of deadlines purged on every call"""
+
+    def __init__(self, ttl_seconds: int = OTP_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}  # mobile_number -> {"otp", "expires_at", **data}
+        self._expiry_heap = []  # (expires_at, mobile_number, otp)
+
+    def _purge_expired(self, now: float) -> None:
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, mobile_number, otp = heapq.heappop(heap)
+            entry = self._entries.get(mobile_number)
+            # Skip heap items whose OTP has since been replaced or consumed
+            if entry and entry["otp"] == otp and entry["expires_at"] == expires_at:
+                del self._entries[mobile_number]
+
+    async def save(self, mobile_number: str, otp: str, data: dict) -> None:
+        now = time.monotonic()
+        self._purge_expired(now)
+        expires_at = now + self.ttl_seconds
+        self._entries[mobile_number] = {**data, "otp": otp, "expires_at": expires_at}
+        heapq.heappush(self._expiry_heap, (expires_at, mobile_number, otp))
+
+    async def get(self, mobile_number: str) -> Optional[dict]:
+        self._purge_expired(time.monotonic())
+        entry = self._entries.get(mobile_number)
+        if not entry:
+            return None
+        return {k: v for k, v in entry.items() if k != "expires_at"}
+
+    async def consume(self, mobile_number: str, otp: str) -> Optional[dict]:
+        self._purge_expired(time.monotonic())
+        entry = self._entries.get(mobile_number)
+        if not entry or entry["otp"] != otp:
+            return None
+        del self._entries[mobile_number]
+        return {k: v for k, v in entry.items() if k != "expires_at"}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class MongoOTPStore(OTPStore):
+    """Shared store backed by a TTL-indexed collection, so any worker can verify any OTP"""
+
+    def __init__(self, collection, ttl_seconds: int = OTP_TTL_SECONDS):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+
+    async def ensure_indexes(self) -> None:
+        # TTL index lives in the registry. Mongo's TTL monitor runs about once a minute,
+        # so reads also filter on expires_at. Lookups go through _id (the mobile number).
+        from database.indexes import ensure_collection_indexes
+        await ensure_collection_indexes(self.collection.name)
+
+    async def save(self, mobile_number: str, otp: str, data: dict) -> None:
+        doc = {**data, "otp": otp, "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl_seconds)}
+        await self.collection.replace_one({"_id": mobile_number}, doc, upsert=True)
+
+    async def get(self, mobile_number: str) -> Optional[dict]:
+        doc = await self.collection.find_one(
+            {"_id": mobile_number, "expires_at": {"$gt": datetime.utcnow()}},
+            {"_id": 0, "expires_at": 0},
+        )
+        return doc
+
+    async def consume(self, mobile_number: str, otp: str) -> Optional[dict]:
+        # Single atomic command: two workers can never both accept the same OTP
+        doc = await self.collection.find_one_and_delete(
+            {"_id": mobile_number, "otp": otp, "expires_at": {"$gt": datetime.utcnow()}},
+            projection={"_id": 0, "expires_at": 0},
+        )
+        return doc
+
+
+def create_otp_store(backend: str = OTP_STORE_BACKEND) -> OTPStore:
+    if backend == "memory":
+        return InMemoryOTPStore()
+    if backend == "mongo":
+        from database.db import otp_db
+        return MongoOTPStore(otp_db)
+    raise ValueError(f"Unknown OTP_STORE_BACKEND '{backend}' (expected 'memory' or 'mongo')")
+
+
+otp_store = create_otp_store()
@@ -0,0 +1,100 @@
+from bson import ObjectId
+from datetime import datetime
+from fastapi import HTTPException
+from typing import Optional, Tuple
+import base64
+import json
+
+# Opaque keyset cursors: urlsafe base64 of a small JSON document. Values are tagged
+# with their BSON type because users._id is a str for email signups and an ObjectId
+# for mobile signups, and Mongo only compares values of the same type.
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+ID_TYPES = (str, ObjectId)  # What an _id in a cursor may decode to
+
+
+def _encode_value(value):
+    if isinstance(value, ObjectId):
+        return {"oid": str(value)}
+    if isinstance(value, datetime):
+        return {"date": value.isoformat()}
+    return {"str": value}
+
+
+def _decode_value(tagged: dict):
+    if "oid" in tagged:
+        return ObjectId(tagged["oid"])
+    if "date" in tagged:
+        return datetime.fromisoformat(tagged["date"])
+    return tagged["str"]
+
+
+def encode_cursor(**values) -> str:
+    payload = json.dumps({k: _encode_value(v) for k, v in values.items()}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, **fields: Tuple[type, ...]) -> dict:
+    """Decode a cursor; each keyword names a required field and the types it may hold.
+
+    Anything malformed, missing or of the wrong type is a 400, never a 500 further down.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = {k: _decode_value(v) for k, v in payload.items()}
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    for name, types in fields.items():
+        if not isinstance(values.get(name), types):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def after_id(last_id) -> dict:
+    """Filter for documents sorted after `last_id` in ascending _id order.
+
+    Strings sort before ObjectIds, so after the last string we must also take every ObjectId.
+    """
+    if isinstance(last_id, ObjectId):
+        return {"_id": {"$gt": last_id}}
+    return {"$or": [{"_id": {"$gt": last_id}}, {"_id": {"$type": "objectId"}}]}
+
+
+def after_created_at_desc(created_at: datetime, last_id) -> dict:
+    """Filter for the next page in (created_at desc, _id desc) order"""
+    return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}},
+        ]
+    }
+
+
+def after_created_at_asc(created_at: datetime, last_id) -> dict:
+    """Filter for documents after (created_at, last_id) in (created_at asc, _id asc) order"""
+    return {
+        "$or": [
+            {"created_at": {"$gt": created_at}},
+            {"created_at": created_at, "_id": {"$gt": last_id}},
+        ]
+    }
+
+
+def page_size(limit: Optional[int]) -> int:
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+
+def projection_from_fields(fields: Optional[str], always_exclude=("password",)) -> dict:
+    """Build a projection from a comma-separated ?fields= list; sensitive fields never leak"""
+    if not fields:
+        return {name: 0 for name in always_exclude}
+    wanted = [f.strip() for f in fields.split(",") if f.strip() and f.strip() not in always_exclude]
+    projection = {name: 1 for name in wanted}
+    projection.setdefault("_id", 1)  # Needed for the next cursor
+    return projection
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from typing import Optional, Tuple
+
+# Analytics filters are always half-open created_at ranges ($gte start, $lt end)
+# so a created_at index can serve them; never $expr on $year/$month.
+#
+# Every analytics day/month/year is an IST calendar unit: bounds below are IST midnights
+# (tz-aware, pymongo converts them to UTC), server-side grouping goes through bucket() /
+# date_part() with the same timezone, and daily_txn_rollups is keyed by IST midnight.
+# Stored created_at values stay naive UTC.
+
+IST = timezone(timedelta(hours=5, minutes=30))
+ANALYTICS_TIMEZONE = "Asia/Kolkata"  # Mongo's name for IST (no DST)
+
+PERIOD_DAYS = {"7d": 7, "30d": 30, "6m": 180, "1y": 365}
+# Years a caller may ask for: the bounds' next year must still be a datetime, and IST
+# bounds must convert to UTC without leaving the datetime range
+MIN_YEAR, MAX_YEAR = 1970, 9998
+
+
+def to_ist(dt: datetime) -> datetime:
+    """Naive datetimes are UTC, as stored by Mongo"""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(IST)
+
+
+def to_utc_naive(dt: datetime) -> datetime:
+    """Aware datetimes converted to UTC and made naive, the way Mongo stores and compares them"""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def ist_now() -> datetime:
+    return datetime.now(IST)
+
+
+def bucket(unit: str, field: str = "$created_at") -> dict:
+    """$dateTrunc to the start of the IST day/week/month/year containing `field`"""
+    return {"$dateTrunc": {"date": field, "unit": unit, "timezone": ANALYTICS_TIMEZONE}}
+
+
+def date_part(operator: str, field: str = "$created_at") -> dict:
+    """IST calendar part of `field`, e.g. date_part("$month")"""
+    return {operator: {"date": field, "timezone": ANALYTICS_TIMEZONE}}
+
+
+def _check_year(year: int) -> None:
+    if year < MIN_YEAR or year > MAX_YEAR:
+        raise HTTPException(status_code=400, detail=f"Year must be between {MIN_YEAR} and {MAX_YEAR}")
+
+
+def year_bounds(year: int) -> Tuple[datetime, datetime]:
+    _check_year(year)
+    return datetime(year, 1, 1, tzinfo=IST), datetime(year + 1, 1, 1, tzinfo=IST)
+
+
+def month_bounds(year: int, month: int) -> Tuple[datetime, datetime]:
+    _check_year(year)
+    if month < 1 or month > 12:
+        raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
+    if month == 12:
+        return datetime(year, 12, 1, tzinfo=IST), datetime(year + 1, 1, 1, tzinfo=IST)
+    return datetime(year, month, 1, tzinfo=IST), datetime(year, month + 1, 1, tzinfo=IST)
+
+
+def day_bounds(day: datetime) -> Tuple[datetime, datetime]:
+    """The IST calendar day containing `day`"""
+    day = to_ist(day)
+    start = datetime(day.year, day.month, day.day, tzinfo=IST)
+    return start, start + timedelta(days=1)
+
+
+def period_bounds(period: str, now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """Bounds for the 1d/7d/30d/6m/1y dashboard periods, in IST"""
+    now = to_ist(now) if now else ist_now()
+    if period == "1d":
+        return day_bounds(now)
+    if period in PERIOD_DAYS:
+        return now - timedelta(days=PERIOD_DAYS[period]), now
+    raise HTTPException(status_code=400, detail="Invalid period")
+
+
+def last_month(now: datetime) -> Tuple[int, int]:
+    """(year, month) of the IST month before `now`"""
+    now = to_ist(now)
+    if now.month == 1:
+        return now.year - 1, 12
+    return now.year, now.month - 1
+
+
+def created_at_range(start: datetime, end: datetime, **extra) -> dict:
+    """$match filter for start <= created_at < end, plus any extra equality conditions"""
+    return {"created_at": {"$gte": start, "$lt": end}, **extra}
+
+
+def year_match(year: int, month: Optional[int] = None, **extra) -> dict:
+    """$match filter for a calendar year, or one month of it when `month` is given"""
+    start, end = month_bounds(year, month) if month else year_bounds(year)
+    return created_at_range(start, end, **extra)
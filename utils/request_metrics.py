@@ -0,0 +1,132 @@
+from typing import Dict, List, Pattern, Tuple
+import time
+from database.monitoring import command_monitor, pool_monitor
+from utils.loop_monitor import loop_monitor
+from utils.metrics import Histogram, render_counter, render_gauge, render_histogram
+
+# Per-route HTTP instrumentation for /metrics. Labels use the route template
+# ("/api/v1/admin/packs/{pack_id}"), never the raw path, so cardinality stays bounded.
+#
+# Everything here runs on the event loop thread and never awaits between read and write,
+# so plain dict/int updates are safe without locks: the whole per-request cost is one
+# route lookup (a dict hit for static paths), two perf_counter() calls and a few dict
+# increments. Routes are indexed on the first request; they don't change after startup.
+
+REQUEST_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+UNMATCHED_ROUTE = "<unmatched>"
+
+_requests: Dict[Tuple[str, str, int], int] = {}
+_latency: Dict[Tuple[str, str], Histogram] = {}
+_in_flight: Dict[Tuple[str, str], int] = {}
+# Per app: ({static path: template}, [(compiled path regex, template)] for parametrized routes)
+_route_indexes: Dict[int, Tuple[Dict[str, str], List[Tuple[Pattern, str]]]] = {}
+
+
+def _route_index(app) -> Tuple[Dict[str, str], List[Tuple[Pattern, str]]]:
+    index = _route_indexes.get(id(app))
+    if index is None:
+        static, dynamic = {}, []
+        for route in app.router.routes:
+            if not hasattr(route, "path_regex"):
+                continue
+            if route.param_convertors:
+                dynamic.append((route.path_regex, route.path))
+            else:
+                static.setdefault(route.path, route.path)
+        index = _route_indexes[id(app)] = (static, dynamic)
+    return index
+
+
+def route_template(scope) -> str:
+    """Template of the route serving this path, matched the way Starlette does but without
+    building path params (Route.matches costs ~50 us per parametrized route)"""
+    static, dynamic = _route_index(scope["app"])
+    path = scope["path"]
+    template = static.get(path)
+    if template is not None:
+        return template
+    for regex, template in dynamic:
+        if regex.match(path):
+            return template
+    return UNMATCHED_ROUTE
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware task/queue overhead, streaming untouched)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        key = (scope["method"], route_template(scope))
+        _in_flight[key] = _in_flight.get(key, 0) + 1
+        status_code = 500  # Unless the app starts a response, Starlette's error handler answers 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _in_flight[key] -= 1
+            histogram = _latency.get(key)
+            if histogram is None:
+                histogram = _latency[key] = Histogram(REQUEST_SECONDS_BUCKETS)
+            histogram.observe(elapsed)
+            counter = key + (status_code,)
+            _requests[counter] = _requests.get(counter, 0) + 1
+
+
+def render_metrics() -> str:
+    lines = []
+    lines += render_counter(
+        "http_requests_total", "HTTP requests by route template and status code",
+        (({"method": m, "route": r, "status": str(s)}, n) for (m, r, s), n in sorted(_requests.items())),
+    )
+    lines += render_histogram(
+        "http_request_duration_seconds", "HTTP request latency, including streamed bodies",
+        (({"method": m, "route": r}, h) for (m, r), h in sorted(_latency.items())),
+    )
+    lines += render_gauge(
+        "http_requests_in_flight", "HTTP requests currently being served",
+        (({"method": m, "route": r}, n) for (m, r), n in sorted(_in_flight.items())),
+    )
+    pool = pool_monitor.snapshot()  # Updated on driver threads; render a locked copy
+    lines += render_histogram(
+        "mongo_pool_checkout_wait_seconds", "Time Motor calls waited to check out a pooled connection",
+        [({}, pool["checkout_wait"])],
+    )
+    lines += render_counter(
+        "mongo_pool_checkout_failures_total", "Failed connection checkouts by reason",
+        (({"reason": reason}, n) for reason, n in sorted(pool["checkout_failures"].items())),
+    )
+    lines += render_gauge("mongo_pool_checked_out_connections", "Connections currently checked out",
+                          [({}, pool["checked_out"])])
+    lines += render_gauge("mongo_pool_open_connections", "Open pooled connections",
+                          [({}, pool["open_connections"])])
+    series = sorted(command_monitor.latency_series(), key=lambda item: (item[0][0], item[0][1] or ""))
+    lines += render_histogram(
+        "mongo_command_duration_seconds", "Mongo command latency by command and collection",
+        (({"command": c, "collection": coll or ""}, h) for (c, coll), h, _ in series), scale=0.001,
+    )
+    lines += render_counter(
+        "mongo_command_errors_total", "Failed Mongo commands by command and collection",
+        (({"command": c, "collection": coll or ""}, errors) for (c, coll), _, errors in series),
+    )
+    lines += render_histogram(
+        "event_loop_lag_seconds", "How late the event loop ran a timer due now (scheduling delay)",
+        [({}, loop_monitor.lag)],
+    )
+    lines += render_gauge("event_loop_lag_max_seconds", "Largest event-loop lag since start",
+                          [({}, loop_monitor.max_lag)])
+    lines += render_counter("event_loop_blocked_total", "Times a callback held the event loop past the blocking threshold",
+                            [({}, loop_monitor.blocked)])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,85 @@
+from cachetools import TTLCache
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+import os
+
+# Single-flight for admin analytics: concurrent identical requests (same endpoint, same
+# normalized params) share one in-flight computation, and its result is kept for
+# ANALYTICS_RESULT_TTL_SECONDS so a burst of N refreshes costs one Mongo query.
+ANALYTICS_RESULT_TTL_SECONDS = float(os.getenv("ANALYTICS_RESULT_TTL_SECONDS", 5))
+ANALYTICS_RESULT_MAXSIZE = int(os.getenv("ANALYTICS_RESULT_MAXSIZE", 1000))
+
+# Handler parameters that identify the caller, not the query
+IGNORED_PARAMS = ("current_user", "request")
+
+_results = TTLCache(maxsize=ANALYTICS_RESULT_MAXSIZE, ttl=ANALYTICS_RESULT_TTL_SECONDS)
+_in_flight: Dict[Hashable, asyncio.Task] = {}
+_stats = {"requests": 0, "executions": 0, "coalesced": 0, "cache_hits": 0, "errors": 0}
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return value.strip().lower()
+    return getattr(value, "value", value)  # Enums by value
+
+
+def request_key(endpoint: str, params: Dict[str, Any]) -> tuple:
+    return (endpoint,) + tuple(sorted(
+        (name, _normalize(value)) for name, value in params.items()
+        if name not in IGNORED_PARAMS and value is not None
+    ))
+
+
+def _store(key: Hashable, task: asyncio.Task) -> None:
+    _in_flight.pop(key, None)
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        _stats["errors"] += 1
+        return  # Errors are never cached; the next request retries
+    _results[key] = task.result()
+
+
+async def run_once(key: Hashable, compute: Callable[[], Awaitable]):
+    """Return the cached result for `key`, join the computation already running, or start it"""
+    _stats["requests"] += 1
+    if key in _results:
+        _stats["cache_hits"] += 1
+        return _results[key]
+    task = _in_flight.get(key)
+    if task is not None:
+        _stats["coalesced"] += 1
+    else:
+        _stats["executions"] += 1
+        task = asyncio.ensure_future(compute())
+        _in_flight[key] = task
+        task.add_done_callback(lambda done: _store(key, done))
+    # shield: one caller disconnecting must not cancel the query the others are waiting on
+    return await asyncio.shield(task)
+
+
+def single_flight(endpoint: str):
+    """Decorator for analytics handlers: results are shared per (endpoint, normalized params)"""
+    def decorator(handler):
+        @wraps(handler)  # FastAPI reads the signature through __wrapped__
+        async def wrapper(**kwargs):
+            return await run_once(request_key(endpoint, kwargs), lambda: handler(**kwargs))
+        return wrapper
+    return decorator
+
+
+def clear_single_flight() -> None:
+    _results.clear()
+
+
+def single_flight_stats() -> dict:
+    requests = _stats["requests"]
+    return {
+        **_stats,
+        "in_flight": len(_in_flight),
+        "cached": len(_results),
+        "ttl_seconds": ANALYTICS_RESULT_TTL_SECONDS,
+        # Share of requests that did not run their own query
+        "dedup_ratio": round(1 - _stats["executions"] / requests, 4) if requests else 0.0,
+    }
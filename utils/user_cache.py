@@ -0,0 +1,47 @@
+from cachetools import TTLCache
+from typing import Optional
+import os
+
+# Per-process cache of authenticated user documents, keyed by the JWT "sub" (user id as string)
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", 60))
+USER_CACHE_MAXSIZE = int(os.getenv("USER_CACHE_MAXSIZE", 10000))
+
+_user_cache = TTLCache(maxsize=USER_CACHE_MAXSIZE, ttl=USER_CACHE_TTL_SECONDS)  # LRU eviction + TTL expiry
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def get_cached_user(user_id) -> Optional[dict]:
+    """Return a copy of the cached user document, or None on miss/expiry"""
+    user = _user_cache.get(str(user_id))
+    if user is None:
+        _stats["misses"] += 1
+        return None
+    _stats["hits"] += 1
+    return dict(user)  # Handlers may mutate the dict, keep the cached one clean
+
+
+def set_cached_user(user_id, user: dict) -> None:
+    _user_cache[str(user_id)] = dict(user)
+
+
+def invalidate_user(user_id) -> None:
+    """Drop a user from the cache after their document changes"""
+    if user_id is None:
+        return
+    if _user_cache.pop(str(user_id), None) is not None:
+        _stats["invalidations"] += 1
+
+
+def clear_user_cache() -> None:
+    _user_cache.clear()
+
+
+def user_cache_stats() -> dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "size": len(_user_cache),
+        "maxsize": USER_CACHE_MAXSIZE,
+        "ttl_seconds": USER_CACHE_TTL_SECONDS,
+        "hit_ratio": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+    }